@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Emits a large generated schema for several targets, with runtime type checking and in production mode
+(UNIDEF_PRODUCTION=1), and reports the speedup of production mode.
+Exits with 1 if the outputs differ, or if the speedup is below --min-speedup.
+
+    python benchmarks/large_schema.py
+    python benchmarks/large_schema.py --models 200 --fields 50 --repeat 3
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = "rust,sql,python_peewee,python_pydantic"
+
+FIELD_TYPES = ["i64", "i32", "u8", "string", "bool", "f64", "timestamp/ms"]
+
+
+def generate_schema(models: int, fields: int) -> str:
+    documents = []
+    for i in range(models):
+        lines = [f"name: model_{i}", "fields:"]
+        for j in range(fields):
+            lines.append(f"  - name: field_{j}")
+            lines.append(f"    type: {FIELD_TYPES[(i + j) % len(FIELD_TYPES)]}")
+            if j == 0:
+                lines.append("    primary: true")
+            elif j % 5 == 0:
+                lines.append("    nullable: true")
+        documents.append("\n".join(lines) + "\n")
+    return "---\n".join(documents)
+
+
+def measure(path: str, production: bool, repeat: int) -> (list, str):
+    env = dict(os.environ)
+    env.pop("UNIDEF_PRODUCTION", None)
+    if production:
+        env["UNIDEF_PRODUCTION"] = "1"
+    timings = []
+    output = None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-m", "unidef", "-t", TARGETS, path],
+            cwd=ROOT,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        timings.append((time.perf_counter() - begin) * 1000)
+        if result.returncode != 0:
+            error = (result.stderr.strip().splitlines() or ["no output"])[-1]
+            raise Exception(f"exited with {result.returncode}: {error}")
+        output = result.stdout
+    return timings, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="unidef large schema benchmark")
+    parser.add_argument("--models", type=int, default=50)
+    parser.add_argument("--fields", type=int, default=30)
+    parser.add_argument("--repeat", "-n", type=int, default=1)
+    parser.add_argument(
+        "--min-speedup",
+        type=float,
+        default=1.0,
+        help="minimum ratio of the checked time to the production time",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "schema.yaml")
+        with open(path, "w") as f:
+            f.write(generate_schema(args.models, args.fields))
+
+        print(f"{args.models} models x {args.fields} fields, targets {TARGETS}")
+        medians = {}
+        outputs = {}
+        for mode, production in [("checked", False), ("production", True)]:
+            timings, outputs[mode] = measure(path, production, args.repeat)
+            medians[mode] = statistics.median(timings)
+            print(
+                f"{mode:<12} median {medians[mode]:9.1f} ms  min {min(timings):9.1f} ms"
+            )
+
+    failed = False
+    if outputs["checked"] != outputs["production"]:
+        print("outputs of checked and production mode differ")
+        failed = True
+    speedup = medians["checked"] / medians["production"]
+    print(f"speedup {speedup:.2f}x, minimum {args.min_speedup:.2f}x")
+    if speedup < args.min_speedup:
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
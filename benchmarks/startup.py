@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Measures the cold start of `python -m unidef` for every built-in target on a tiny input,
+and breaks the import time down by module with `-X importtime`.
+Exits with 1 if a target or the import time is over its budget.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --budget rust=800 --import-budget 300 --repeat 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIELDS_MODEL = """\
+name: startup
+fields:
+  - name: id
+    type: i64
+  - name: name
+    type: string
+"""
+
+JAVASCRIPT_SOURCE = """\
+module.exports = class foo extends Base {
+    bar() {
+        return 1;
+    }
+};
+"""
+
+# target, extra arguments, input
+CASES = [
+    ("no_target", [], FIELDS_MODEL),
+    ("sql", [], FIELDS_MODEL),
+    ("rust", [], FIELDS_MODEL),
+    ("python_peewee", [], FIELDS_MODEL),
+    ("python_pydantic", [], FIELDS_MODEL),
+    ("rust_lang", ["-l", "javascript"], JAVASCRIPT_SOURCE),
+]
+
+# milliseconds, for the median of the runs
+DEFAULT_BUDGET = 1500
+BUDGETS = {
+    "no_target": 1000,
+    "rust_lang": 4000,
+}
+DEFAULT_IMPORT_BUDGET = 500
+
+
+def run(args, **kwargs) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable] + args,
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        **kwargs,
+    )
+
+
+def measure(args, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = run(args)
+        timings.append((time.perf_counter() - begin) * 1000)
+        if result.returncode != 0:
+            error = (result.stderr.strip().splitlines() or ["no output"])[-1]
+            raise Exception(f"exited with {result.returncode}: {error}")
+    return timings
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    Returns (cumulative microseconds, module) of the modules imported at top level
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not cumulative.strip().isdigit() or name.startswith("  "):
+            continue
+        modules.append((int(cumulative), name.strip()))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="unidef startup benchmark")
+    parser.add_argument("--repeat", "-n", type=int, default=5)
+    parser.add_argument(
+        "--budget",
+        action="append",
+        default=[],
+        metavar="TARGET=MS",
+        help="budget of a target in milliseconds",
+    )
+    parser.add_argument(
+        "--import-budget",
+        type=int,
+        default=DEFAULT_IMPORT_BUDGET,
+        help="budget of the import time of `-t no_target` in milliseconds",
+    )
+    parser.add_argument("--top", type=int, default=10, help="modules to report")
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS)
+    for budget in args.budget:
+        target, ms = budget.split("=")
+        budgets[target] = int(ms)
+
+    failed = []
+    with tempfile.TemporaryDirectory() as directory:
+        for target, extra, content in CASES:
+            path = os.path.join(directory, target + ".in")
+            with open(path, "w") as f:
+                f.write(content)
+            try:
+                timings = measure(
+                    ["-m", "unidef", "-t", target] + extra + [path], args.repeat
+                )
+            except Exception as e:
+                print(f"{target:<16} {e}")
+                failed.append(target)
+                continue
+            median = statistics.median(timings)
+            budget = budgets.get(target, DEFAULT_BUDGET)
+            status = "ok" if median <= budget else "OVER BUDGET"
+            print(
+                f"{target:<16} median {median:8.1f} ms  min {min(timings):8.1f} ms  "
+                f"budget {budget:6d} ms  {status}"
+            )
+            if median > budget:
+                failed.append(target)
+
+        path = os.path.join(directory, "no_target.in")
+        result = run(["-X", "importtime", "-m", "unidef", "-t", "no_target", path])
+    modules = parse_importtime(result.stderr)
+    total = sum(cumulative for cumulative, _ in modules) / 1000
+    print(f"\nimport time of -t no_target: {total:.1f} ms, budget {args.import_budget} ms")
+    for cumulative, name in sorted(modules, reverse=True)[: args.top]:
+        print(f"{cumulative / 1000:8.1f} ms  {name}")
+    if total > args.import_budget:
+        failed.append("import time")
+
+    if failed:
+        print("\nover budget: " + ", ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
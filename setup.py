@@ -10,9 +10,12 @@ with open("requirements.txt", "r", encoding="utf-8") as fh:
         req = line.split("#")[0].strip()
         if req and req not in extra_requirements:
             requirements.append(req)
+version = {}
+with open("unidef/version.py", "r", encoding="utf-8") as fh:
+    exec(fh.read(), version)
 setuptools.setup(
     name="unidef",
-    version="0.2.1",
+    version=version["VERSION"],
     author="Jiangkun QIU",
     author_email="qjk2001@gmail.com",
     description="Define once, run everywhere",
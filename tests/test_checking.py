@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, '.')
+
+MODEL = 'name: a\nfields:\n  - name: id\n    type: i64\n    primary: true\n  - name: name\n    type: string\n'
+
+
+def emit(env: dict) -> str:
+    return subprocess.run(
+        [sys.executable, '-m', 'unidef', '-t', 'rust,sql,python_pydantic'],
+        input=MODEL,
+        env=dict(os.environ, **env),
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    ).stdout
+
+
+def test_production_mode_emits_the_same():
+    assert emit({'UNIDEF_PRODUCTION': '1'}) == emit({'UNIDEF_PRODUCTION': '0'})
+
+
+def test_production_mode_does_not_check_internal_methods():
+    code = """
+from unidef.utils.checking import set_production_mode
+set_production_mode()
+from unidef.models.base_model import MixedModel
+from unidef.utils.name_convert import to_snake_case
+import unidef.__main__
+
+def is_checked(func):
+    return hasattr(func, '__wrapped__') or func.__code__.co_filename.startswith('<@beartype')
+
+assert not is_checked(MixedModel.append_field)
+assert not is_checked(to_snake_case)
+assert is_checked(unidef.__main__.main)
+"""
+    env = dict(os.environ)
+    env.pop('UNIDEF_PRODUCTION', None)
+    subprocess.run([sys.executable, '-c', code], env=env, check=True)
@@ -0,0 +1,164 @@
+import sys
+
+sys.path.insert(0, '.')
+from unidef.__main__ import *
+
+MODEL = """
+name: {name}
+fields:
+  - name: id
+    type: i64
+    primary: true
+"""
+
+
+def test_batch_keeps_order(tmp_path):
+    for name in ['a', 'b', 'c']:
+        (tmp_path / f'{name}.yaml').write_text(MODEL.format(name=name) + '---' + MODEL.format(name=name + '2'))
+    args = parser.parse_args(['-t', 'sql', '-b', str(tmp_path / '*.yaml')])
+    config = CommandLineConfig.from_args(args)
+
+    sequential = []
+    main_batch(config, args.batch, jobs=1, output=sequential.append)
+    parallel = []
+    main_batch(config, args.batch, jobs=2, output=parallel.append)
+    assert len(sequential) == 6
+    assert sequential == parallel
+
+
+def test_incremental_emitter():
+    args = parser.parse_args(['-t', 'sql'])
+    config = CommandLineConfig.from_args(args)
+    emitter = IncrementalEmitter(config)
+    first = emitter.update(MODEL.format(name='a') + '---' + MODEL.format(name='b'))
+    assert len(first) == 2
+
+    emitter.emitted = {key: ['cached'] for key in emitter.emitted}
+    second = emitter.update(MODEL.format(name='a') + '---' + MODEL.format(name='c'))
+    assert second[0] == ('a', 'sql', 'cached')
+    assert second[1] != ('c', 'sql', 'cached')
+    assert len(emitter.emitted) == 2
+
+    third = emitter.update(MODEL.format(name='a') + '---' + MODEL.format(name='d'), changed_only=True)
+    assert [name for name, _, _ in third] == ['d']
+
+
+def test_serve():
+    import threading
+    import urllib.request
+
+    from unidef.server import create_server
+
+    server = create_server('127.0.0.1:0', EmitService())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address
+        content = MODEL.format(name='a') + '---' + MODEL.format(name='b')
+        expected = []
+        main(CommandLineConfig(target='sql', file=''), content, output=expected.append)
+        for _ in range(2):
+            response = urllib.request.urlopen(f'http://{host}:{port}/emit?target=sql', data=content.encode())
+            assert response.read().decode() == ''.join(x + '\n' for x in expected)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_service_emits_concurrently(monkeypatch):
+    import threading
+
+    import unidef.__main__
+
+    # both requests must be emitting at the same time to pass the barrier
+    barrier = threading.Barrier(2, timeout=10)
+
+    def emit(target, model):
+        barrier.wait()
+        return model.name
+
+    monkeypatch.setattr(unidef.__main__, 'emit_model', emit)
+    service = EmitService()
+    config = CommandLineConfig(target='sql', file='')
+    results = {}
+
+    def request(name):
+        results[name] = service.emit(config, MODEL.format(name=name))
+
+    threads = [threading.Thread(target=request, args=(name,)) for name in ['a', 'b']]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {'a': ['a'], 'b': ['b']}
+    assert service.emit(config, MODEL.format(name='a')) == ['a']
+
+
+def test_output_dir(tmp_path):
+    (tmp_path / 'in.yaml').write_text(MODEL.format(name='FirstModel') + '---' + MODEL.format(name='second'))
+    out = tmp_path / 'out'
+    args = parser.parse_args(['-t', 'rust', '--output-dir', str(out), str(tmp_path / 'in.yaml')])
+    config = CommandLineConfig.from_args(args)
+    main(config, (tmp_path / 'in.yaml').read_text())
+    assert sorted(p.name for p in out.iterdir()) == ['first_model.rs', 'second.rs']
+    mtime = (out / 'second.rs').stat().st_mtime_ns
+    main(config, (tmp_path / 'in.yaml').read_text())
+    assert (out / 'second.rs').stat().st_mtime_ns == mtime
+
+
+def test_many_targets_parse_once(tmp_path, monkeypatch):
+    from unidef.parsers.fields_parser import FieldsParser
+
+    parsed = []
+    parse = FieldsParser.parse
+
+    def counted_parse(self, name, fmt):
+        parsed.append(name)
+        return parse(self, name, fmt)
+
+    monkeypatch.setattr(FieldsParser, 'parse', counted_parse)
+    (tmp_path / 'in.yaml').write_text(MODEL.format(name='a'))
+    args = parser.parse_args(['-t', 'rust,sql', '--output-dir', str(tmp_path / 'out'), str(tmp_path / 'in.yaml')])
+    config = CommandLineConfig.from_args(args)
+    main(config, (tmp_path / 'in.yaml').read_text())
+    assert parsed == ['a']
+    assert (tmp_path / 'out' / 'rust' / 'a.rs').exists()
+    assert (tmp_path / 'out' / 'sql' / 'a.sql').exists()
+
+
+def test_watch_survives_replaced_file(tmp_path, monkeypatch):
+    path = tmp_path / 'model.yaml'
+    path.write_text(MODEL.format(name='a'))
+    config = CommandLineConfig.from_args(parser.parse_args(['-t', 'sql', str(path)]))
+    # an editor removes the file, and writes it again
+    steps = [
+        path.unlink,
+        lambda: path.write_text(MODEL.format(name='a').replace('i64', 'string')),
+    ]
+
+    def sleep(interval):
+        if not steps:
+            raise KeyboardInterrupt()
+        steps.pop(0)()
+
+    monkeypatch.setattr(time, 'sleep', sleep)
+    outputs = []
+    main_watch(config, output=outputs.append, interval=0.0)
+    assert len(outputs) == 2 and outputs[0] != outputs[1]
+
+
+def test_output_mode(tmp_path):
+    import stat
+
+    from unidef.utils.sink import write_if_changed
+
+    path = str(tmp_path / 'out.rs')
+    umask = os.umask(0o022)
+    try:
+        write_if_changed(path, 'struct A;')
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+        os.chmod(path, 0o640)
+        write_if_changed(path, 'struct B;')
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+    finally:
+        os.umask(umask)
@@ -0,0 +1,112 @@
+import json
+import subprocess
+import sys
+
+sys.path.insert(0, '.')
+from unidef.__main__ import CommandLineConfig, load_models
+from unidef.languages.common.type_merge import TypeMerger, merge_types
+from unidef.languages.common.type_model import Traits, infer_type_from_example
+from unidef.models.config_model import ModelDefinition
+from unidef.models.input_model import ExampleInput
+from unidef.parsers.ndjson_parser import (infer_shard, infer_shards, read_json_lines,
+                                           shard_cache_key, split_shards)
+from unidef.utils.cache import DiskCache
+
+
+def write_lines(path, records):
+    with open(path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n\n')
+
+
+def test_read_json_lines(tmp_path):
+    path = tmp_path / 'feed.jsonl'
+    write_lines(path, [{'a': i} for i in range(3)])
+    assert list(read_json_lines(str(path))) == [{'a': 0}, {'a': 1}, {'a': 2}]
+    empty = tmp_path / 'empty.jsonl'
+    empty.write_text('')
+    assert list(read_json_lines(str(empty))) == []
+
+
+def test_ndjson_file_is_streamed(tmp_path):
+    path = tmp_path / 'feed.jsonl'
+    write_lines(path, [{'price': 1, 'side': 'buy'}, {'price': 1.5, 'fee': 0.1}])
+    config = CommandLineConfig(target='rust', format='ndjson', file=str(path))
+    with open(path) as f:
+        model = next(load_models(config, f))
+    assert model.example.file == str(path) and not model.example.text
+    parsed = model.get_parsed()
+    assert parsed.get_field(Traits.TypeName) == 'stdin'
+    assert parsed.get_by_path('price').has(Traits.Floating)
+    assert parsed.get_by_path('side').has(Traits.Nullable)
+    assert parsed.get_by_path('fee').has(Traits.Nullable)
+
+
+def test_ndjson_text():
+    model = ModelDefinition(name='quote', example=ExampleInput(format='jsonl', text='{"a": 1}\n{"a": null}\n'))
+    assert model.get_parsed().get_by_path('a').has(Traits.Nullable)
+
+
+def test_merger_skips_merged_shapes():
+    samples = [{'id': i, 'tags': [i, str(i)] * (i % 2)} for i in range(10)]
+    merger = TypeMerger()
+    for sample in samples:
+        merger.add_sample(sample)
+    assert merger.samples == 10 and len(merger.shapes) == 2
+    merged = infer_type_from_example(samples[0], '', 'drop')
+    for sample in samples[1:]:
+        merged = merge_types(merged, infer_type_from_example(sample, '', 'drop'))
+    result = merger.result()
+    # the names of inferred structs are random
+    merged.name = result.name
+    assert result == merged
+
+
+def test_shards_end_at_lines(tmp_path):
+    path = tmp_path / 'feed.jsonl'
+    records = [{'seq': i, 'price': i / 2} for i in range(100)]
+    write_lines(path, records)
+    shards = split_shards([str(path)], size=100)
+    assert len(shards) > 1
+    assert [s[1] for s in shards[1:]] == [s[2] for s in shards[:-1]]
+    assert [r for shard in shards for r in read_json_lines(*shard)] == records
+
+
+def test_infer_shards_in_parallel(tmp_path):
+    paths = []
+    for day in range(3):
+        path = tmp_path / f'day{day}.jsonl'
+        write_lines(path, [{'seq': i, 'fee': None if day else 0.1} for i in range(50)])
+        paths.append(str(path))
+    shards = split_shards(paths, size=256)
+    serial = infer_shards(shards, 'feed', jobs=1)
+    parallel = infer_shards(shards, 'feed', jobs=2)
+    assert serial.samples == parallel.samples == 150
+    serial, parallel = serial.result(), parallel.result()
+    parallel.name = serial.name
+    assert serial == parallel
+    assert serial.get_by_path('fee').has(Traits.Nullable)
+    assert serial.get_field(Traits.RawValue) == {'seq': 0, 'fee': 0.1}
+
+
+def test_shards_are_cached(tmp_path):
+    path = tmp_path / 'feed.jsonl'
+    write_lines(path, [{'seq': i} for i in range(10)])
+    cache = DiskCache(str(tmp_path / 'cache'))
+    shard = split_shards([str(path)])[0]
+    partial = infer_shard(shard, 'feed', 'drop', cache)
+    assert partial.shapes
+    cached = cache.get(shard_cache_key(shard, 'feed', 'drop'))
+    assert cached.samples == 10 and not cached.shapes
+    assert infer_shard(shard, 'feed', 'drop', cache).samples == 10
+
+
+def test_read_stdin_pipe():
+    result = subprocess.run(
+        [sys.executable, '-m', 'unidef', '-f', 'ndjson', '-t', 'rust'],
+        input='{"a": 1}\n{"a": 2.5}\n',
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    assert 'pub a: f64,' in result.stdout
@@ -2,6 +2,8 @@ import sys
 
 sys.path.insert(0, '.')
 from unidef.__main__ import *
+from unidef.languages.common.type_model import RAW_VALUE_TEXT, Traits, traverse_type
+from unidef.version import VERSION
 
 
 def try_parse(fm, to):
@@ -22,3 +24,48 @@ def test_parse_json_example():
         try_parse("comments_example", target)
 
 
+def test_raw_value_follows_emitters():
+    content = 'name: quote\nexample:\n  format: json\n  text: |\n    {"bid": {"price": 1.5}}\n'
+
+    def parse(targets):
+        model = next(load_models(CommandLineConfig(target=targets, file=''), content))
+        require_raw_value(targets.split(','), model)
+        return model.get_parsed()
+
+    assert parse('sql').get_field_opt(Traits.RawValue) is None
+    assert parse('sql,rust_json').get_field(Traits.RawValue) == {'bid': {'price': 1.5}}
+    parsed = parse('rust_json')
+    bid = parsed.get_field(Traits.StructFields)[0].field_type
+    assert bid.get_field_opt(Traits.RawValue) is None
+    model = next(load_models(CommandLineConfig(target='sql', file=''), content))
+    model.require_raw_value(RAW_VALUE_TEXT)
+    assert model.get_parsed().get_field(Traits.RawValue) == '{"bid": {"price": 1.5}}\n'
+
+
+def test_nested_struct_cache_key():
+    content = 'name: quote\nexample:\n  format: json\n  text: |\n    {"bid": {"price": 1.5}}\n'
+    model = next(read_model_definition(content))
+    emit_model('rust', model)
+    bid = model.get_parsed().get_by_path('bid')
+    key = DiskCache.key(VERSION, 'rust', bid.structural_hash())
+    # the nested struct is cached apart from what RustDataEmitter.emit_type renders
+    assert key not in EMISSION_CACHE.memory
+    assert DiskCache.key(VERSION, 'rust', bid.structural_hash(), 'struct') in EMISSION_CACHE.memory
+
+
+def test_nested_struct_names():
+    def struct_names():
+        with open('examples/api_example.yaml') as f:
+            models = list(read_model_definition(f.read()))
+        names = []
+        for model in models:
+            traverse_type(
+                model.get_parsed(),
+                pre=lambda depth, ty: names.append(ty.get_field(Traits.TypeName)) if ty.has(Traits.Struct) else None,
+            )
+        return names
+
+    names = struct_names()
+    assert 'BinanceUserDataV2_assets' in names
+    assert len(names) == len(set(names))
+    assert struct_names() == names
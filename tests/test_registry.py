@@ -0,0 +1,42 @@
+import subprocess
+import sys
+
+sys.path.insert(0, '.')
+from unidef.emitters.registry import EmitterRegistry
+from unidef.utils.loader import LazyPlugin
+
+
+def test_lazy_emitter_is_loaded_once_selected():
+    registry = EmitterRegistry()
+    registry.add_lazy_emitter('SqlEmitter', 'unidef.emitters.sql_model', lambda s: s == 'sql')
+    plugin = registry.emitters[0]
+    assert isinstance(plugin, LazyPlugin) and not plugin.loaded
+    assert registry.find_emitter('rust') is None
+    assert not plugin.loaded
+    emitter = registry.find_emitter('sql')
+    assert type(emitter).__name__ == 'SqlEmitter'
+    assert registry.find_emitter('sql') is emitter
+
+
+def test_sql_target_does_not_import_other_emitters():
+    code = """
+import sys
+from unidef.__main__ import CommandLineConfig, main
+main(CommandLineConfig(target='sql', file=''), 'name: a\\nfields:\\n  - name: id\\n    type: i64\\n')
+loaded = [m for m in ['unidef.languages.python', 'unidef.languages.rust.rust_ast', 'esprima', 'jinja2']
+          if m in sys.modules]
+assert not loaded, loaded
+"""
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_type_registry_memoizes_detected_types():
+    from unidef.languages.common.type_model import TypeRegistry, parse_type_definition
+
+    registry = TypeRegistry()
+    registry.add_type_detector(parse_type_definition)
+    order = registry.get_type('Order')
+    assert order.is_frozen() and registry.get_type('Order') is order
+    assert registry.get_type('timestamp/ms') is registry.get_type('timestamp/ms')
+    stats = registry.stats()
+    assert stats['hits'] == 2 and stats['misses'] == 2 and stats['detected'] == 2
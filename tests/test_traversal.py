@@ -0,0 +1,109 @@
+import sys
+
+sys.path.insert(0, '.')
+from unidef.languages.common.type_model import (SKIP_CHILDREN, STOP_WALK,
+                                                FieldType, StructType, Traits,
+                                                Types, intern_type,
+                                                traverse_type, walk_type)
+
+
+def nested_struct(depth: int) -> StructType:
+    struct = StructType(name='leaf', fields=[FieldType(field_name='value', field_type=Types.I64)])
+    for i in range(depth):
+        struct = StructType(name=f'level_{i}', fields=[FieldType(field_name='child', field_type=struct)])
+    return struct
+
+
+def test_traverse_deep_type():
+    depth = sys.getrecursionlimit() * 2
+    struct = nested_struct(depth)
+    structs = []
+    traverse_type(struct, pre=lambda d, ty: structs.append(ty) if ty.has(Traits.Struct) else None)
+    assert len(structs) == depth + 1
+    assert struct.get_by_path(['child'] * depth + ['value']) is Types.I64
+
+
+def test_traverse_cyclic_type():
+    struct = StructType(name='node', fields=[])
+    struct.fields.append(FieldType(field_name='next', field_type=struct))
+    visited = []
+    assert not traverse_type(struct, pre=lambda d, ty: visited.append(ty))
+    assert len(visited) == 2
+    fields = []
+    walk_type(struct, lambda d, ty: fields.append(ty.get_field(Traits.FieldName)))
+    assert fields == ['next']
+
+
+def test_walk_type_stops_at_fields():
+    struct = nested_struct(2)
+    fields = []
+    walk_type(struct, lambda d, ty: fields.append(ty.get_field(Traits.FieldName)))
+    assert fields == ['child']
+
+
+def test_freeze_and_intern_deep_types():
+    depth = sys.getrecursionlimit() * 2
+    struct = nested_struct(depth).freeze()
+    assert struct.get_by_path(['child'] * depth).is_frozen()
+    cyclic_struct().freeze()
+    interned = intern_type(nested_struct(depth))
+    assert interned is intern_type(nested_struct(depth))
+    assert interned.get_by_path(['child'] * (depth - 1)).is_interned()
+
+
+def cyclic_struct() -> StructType:
+    struct = StructType(name='node', fields=[FieldType(field_name='id', field_type=Types.I64)])
+    struct.fields.append(FieldType(field_name='next', field_type=struct))
+    return struct
+
+
+def test_hash_cyclic_and_deep_types():
+    assert cyclic_struct().structural_hash() == cyclic_struct().structural_hash()
+    other = cyclic_struct()
+    other.fields[0].field_type = Types.String
+    assert other.structural_hash() != cyclic_struct().structural_hash()
+    deep = nested_struct(sys.getrecursionlimit() * 2)
+    assert deep.structural_hash() == nested_struct(sys.getrecursionlimit() * 2).structural_hash()
+
+
+def test_emission_cache_of_cyclic_type():
+    from unidef.emitters.registry import EMITTER_REGISTRY
+    from unidef.utils.cache import EmissionCache
+
+    emitted = EMITTER_REGISTRY.find_emitter('sql').emit_type('sql', cyclic_struct())
+    assert emitted.startswith('id bigint not null')
+
+    class Unhashable:
+        def structural_hash(self):
+            raise ValueError()
+
+    assert EmissionCache().emit('sql', Unhashable(), lambda: 'emitted') == 'emitted'
+
+
+def test_traverse_hooks():
+    struct = nested_struct(3)
+    order = []
+    stopped = traverse_type(
+        struct,
+        pre=lambda d, ty: order.append(('pre', d)),
+        post=lambda d, ty: order.append(('post', d)) or (STOP_WALK if d == 4 else None),
+    )
+    assert stopped
+    assert order[:3] == [('pre', 0), ('pre', 1), ('pre', 2)]
+    assert order[-1] == ('post', 4)
+    skipped = []
+    traverse_type(struct, pre=lambda d, ty: skipped.append(d) or SKIP_CHILDREN)
+    assert skipped == [0]
+
+
+def test_get_field_by_name():
+    struct = StructType(name='a', fields=[FieldType(field_name=f'f{i}', field_type=Types.I64) for i in range(300)])
+    assert struct.get_field_by_name('f299') is struct.fields[299]
+    struct.fields.append(FieldType(field_name='inner', field_type=nested_struct(2)))
+    assert struct.get_by_path('inner.child.child.value') is Types.I64
+    struct.replace_field(Traits.StructFields([FieldType(field_name='f0', field_type=Types.String)]))
+    assert struct.get_field_by_name('f299') is None
+    assert struct.get_by_path(['f0']) is Types.String
+    struct.fields[0] = FieldType(field_name='g0', field_type=Types.I64)
+    assert struct.get_field_by_name('f0') is None
+    assert struct.get_field_by_name('g0') is struct.fields[0]
@@ -0,0 +1,142 @@
+import sys
+
+sys.path.insert(0, '.')
+from unidef.languages.common.type_merge import (TypeMerger, infer_type_from_samples, merge_types,
+                                                unify_types)
+from unidef.languages.common.type_model import (ArraySampling, Traits, Types, UnionType,
+                                                VectorType, from_json_type,
+                                                infer_type_from_example, string_wrapped)
+from unidef.models.config_model import read_model_definition
+
+
+def test_merge_numbers():
+    assert merge_types(Types.I64, Types.Double) is Types.Double
+    assert merge_types(Types.U8, Types.I8) is Types.I16
+    assert merge_types(Types.U32, Types.U64) is Types.U64
+    ty = merge_types(Types.NoneType, Types.I64)
+    assert ty.has(Traits.Nullable) and ty.has(Traits.Integer)
+    assert merge_types(Types.AllValue, Types.String) is Types.String
+
+
+def test_merge_samples():
+    ty = infer_type_from_samples([
+        {'price': 1, 'size': '0.5', 'side': 'buy', 'fee': None, 'fills': []},
+        {'price': 1.5, 'size': '1', 'side': 2, 'fee': 0.1, 'fills': [{'qty': 1}], 'extra': True},
+        {'price': 2, 'size': 'abc', 'side': 'sell', 'fills': [{'qty': 2.5}]},
+    ])
+    assert [field.field_name for field in ty.fields] == ['price', 'size', 'side', 'fee', 'fills', 'extra']
+    get = ty.get_by_path
+    assert get('price').has(Traits.Floating) and not get('price').has(Traits.Nullable)
+    assert get('size').has(Traits.String) and not get('size').has(Traits.StringWrapped)
+    side = get('side')
+    assert isinstance(side, UnionType) and len(side.generics) == 2
+    assert get('fee').has(Traits.Floating) and get('fee').has(Traits.Nullable)
+    assert get('extra').has(Traits.Bool) and get('extra').has(Traits.Nullable)
+    qty = get('fills').get_field(Traits.Generics)[0].get_by_path('qty')
+    assert qty.has(Traits.Floating) and not qty.has(Traits.Nullable)
+
+
+def test_merge_is_bounded_by_schema():
+    merger = TypeMerger()
+    for i in range(200):
+        merger.add_sample({'id': i, 'tags': ['a'] * (i % 3)})
+    ty = merger.result()
+    assert merger.samples == 200
+    assert ty.get_by_path('tags').generics[0].has(Traits.String)
+
+
+def test_inferred_scalars_are_shared():
+    ty = infer_type_from_example({'a': 1, 'b': 2, 'c': '1.5', 'd': '2.5', 'e': [3]})
+    i64 = from_json_type(Types.I64)
+    assert i64.is_interned()
+    assert ty.get_by_path('a') is i64 and ty.get_by_path('b') is i64
+    assert ty.get_by_path('e').generics[0] is i64
+    assert ty.get_by_path('c') is ty.get_by_path('d') is from_json_type(string_wrapped(Types.Double))
+
+
+def test_unify_elements():
+    assert unify_types([]) is Types.AllValue
+    assert VectorType(Types.I64, [Types.I64, Types.I64]).generics == [Types.I64]
+    assert VectorType(Types.U8, [Types.I32]).generics == [Types.I32]
+    element = VectorType(Types.I64, [Types.String, Types.I8]).generics[0]
+    assert isinstance(element, UnionType)
+    assert element.generics == [Types.I64, Types.String]
+    element = infer_type_from_example([1, 'a', None, 2.5]).generics[0]
+    assert isinstance(element, UnionType) and element.has(Traits.Nullable)
+
+
+def test_array_sampling():
+    levels = [[i, 0.5] for i in range(50000)] + [[1.5, None]]
+    assert len(ArraySampling('first', 10).sample(levels)) == 10
+    assert len(ArraySampling('stride', 10).sample(levels)) <= 10
+    reservoir = ArraySampling('reservoir', 10)
+    assert reservoir.sample(levels) == reservoir.sample(levels)
+    assert ArraySampling('all').sample(levels) is levels
+
+    ty = infer_type_from_example({'bids': levels})
+    # the last level is not sampled
+    assert ty.get_by_path('bids').generics[0].generics[0] is Types.Double
+    ty = infer_type_from_example({'bids': levels[-1000:]}, '', 'keep', ArraySampling('all'))
+    element = ty.get_by_path('bids').generics[0].generics[0]
+    assert element.has(Traits.Floating) and element.has(Traits.Nullable)
+
+
+def test_samples_input():
+    content = '''\
+name: quote
+example:
+  format: json
+  samples:
+    - '{"bid": 1, "ask": null}'
+    - '{"bid": 1.5, "ask": 2}'
+'''
+    parsed = next(read_model_definition(content)).get_parsed()
+    assert parsed.get_field(Traits.TypeName) == 'quote'
+    assert parsed.get_by_path('bid') is Types.Double
+    assert parsed.get_by_path('ask').has(Traits.Nullable)
+    assert parsed.get_field(Traits.RawValue) == {'bid': 1, 'ask': None}
+
+
+def test_comments_on_merged_elements():
+    content = '''\
+name: book
+example:
+  format: json
+  text: |
+    {"levels": [
+      {"price": 1,
+       // quantity
+       "qty": 2},
+      {"price": 1.5, "qty": 3}
+    ]}
+'''
+    parsed = next(read_model_definition(content)).get_parsed()
+    level = parsed.get_by_path('levels').generics[0]
+    assert level.get_field_by_name('qty').get_field(Traits.BeforeLineComment) == [' quantity']
+    assert level.get_by_path('price') is Types.Double
+
+
+def test_merge_deep_and_cyclic_types():
+    from unidef.languages.common.type_model import FieldType, StructType
+    from unidef.parsers.json_parser import JsonParser
+
+    def nested(depth: int, leaf) -> StructType:
+        struct = StructType(name='leaf', fields=[FieldType(field_name='value', field_type=leaf)])
+        for i in range(depth):
+            struct = StructType(name=f'level_{i}', fields=[FieldType(field_name='child', field_type=struct)])
+        return struct
+
+    depth = sys.getrecursionlimit() * 2
+    merged = merge_types(nested(depth, Types.U8), nested(depth, Types.I64))
+    assert merged.get_by_path(['child'] * depth + ['value']) is Types.I64
+    commented = JsonParser().attach_comments(merged, {(depth, 'child'): 'last'})
+    leaf = commented.get_by_path(['child'] * (depth - 1))
+    assert leaf.get_field_by_name('child').get_field(Traits.BeforeLineComment) == ['last']
+
+    a = nested(0, Types.I64)
+    a.fields.append(FieldType(field_name='next', field_type=a))
+    b = nested(0, Types.String)
+    b.fields.append(FieldType(field_name='next', field_type=b))
+    merged = merge_types(a, b)
+    assert merged.get_by_path('value').has(Traits.Union)
+    assert merged.get_by_path('next') is a
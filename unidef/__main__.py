@@ -1,23 +1,73 @@
 import argparse
+import glob
+import io
 import logging
 import os.path
 import sys
+import threading
+import time
+from collections import OrderedDict
 
-from beartype import beartype
 from pydantic import BaseModel
 
+from unidef.emitters import EMISSION_CACHE, Emitter
 from unidef.emitters.registry import EMITTER_REGISTRY
-from unidef.models.config_model import ModelDefinition, read_model_definition
+from unidef.languages.common.type_model import RAW_VALUE_KEEP
+from unidef.models.config_model import (ModelDefinition, read_model_definition,
+                                        set_inference_jobs, set_parse_cache)
 from unidef.models.input_model import *
+from unidef.utils.cache import DiskCache
+from unidef.utils.checking import api_beartype
+from unidef.utils.sink import (CallbackSink, DirectorySink, FileSink,
+                               OutputSink)
 from unidef.utils.typing_ext import *
 from pydantic import BaseModel
 
 parser = argparse.ArgumentParser(description="define once, export everywhere")
 parser.add_argument(
-    "--target", "-t", default="no_target", type=str, nargs="?", help="target format"
+    "--target",
+    "-t",
+    default="no_target",
+    type=str,
+    nargs="?",
+    help="target format, or comma separated target formats",
 )
 parser.add_argument("--format", "-f", type=str, nargs="?", help="input format")
 parser.add_argument("--lang", "-l", type=str, nargs="?", help="input language")
+parser.add_argument(
+    "--batch",
+    "-b",
+    type=str,
+    nargs="+",
+    help="input files or glob patterns, emitted in parallel",
+)
+parser.add_argument(
+    "--jobs",
+    "-j",
+    type=int,
+    help="number of worker processes in batch mode, or inferring large JSON Lines examples",
+)
+parser.add_argument(
+    "--watch",
+    "-w",
+    action="store_true",
+    help="re-emit the changed documents whenever the input file changes",
+)
+parser.add_argument(
+    "--serve",
+    type=str,
+    metavar="ADDRESS",
+    help="serve emit requests on a unix socket path or host:port",
+)
+parser.add_argument(
+    "--output", "-o", type=str, help="write all models into this file"
+)
+parser.add_argument(
+    "--output-dir", type=str, help="write every model into its own file in this directory"
+)
+parser.add_argument(
+    "--cache-dir", type=str, help="directory of the persistent parse cache"
+)
 parser.add_argument(
     "file", default="/dev/stdin", type=str, nargs="?", help="input file"
 )
@@ -28,23 +78,70 @@ class CommandLineConfig(BaseModel):
     format: Optional[str]
     lang: Optional[str]
     file: str
+    cache_dir: Optional[str] = None
+    output: Optional[str] = None
+    output_dir: Optional[str] = None
+    jobs: Optional[int] = None
 
     @classmethod
     def from_args(cls, args, **kwargs) -> __qualname__:
         args = dict(
-            target=args.target, lang=args.lang, format=args.format, file=args.file
+            target=args.target,
+            lang=args.lang,
+            format=args.format,
+            file=args.file,
+            cache_dir=args.cache_dir,
+            output=args.output,
+            output_dir=args.output_dir,
+            jobs=args.jobs,
         )
         args.update(kwargs)
         return CommandLineConfig.parse_obj(args)
 
+    @property
+    def targets(self) -> List[str]:
+        return [target.strip() for target in self.target.split(",")]
 
-@beartype
-def main(
-    config: CommandLineConfig, content: str, output: Callable[[str], None] = print
-):
+
+def setup_caches(cache_dir: Optional[str]):
+    if cache_dir:
+        set_parse_cache(DiskCache(cache_dir))
+        EMISSION_CACHE.disk = DiskCache(cache_dir)
+
+
+def setup_worker(cache_dir: Optional[str]):
+    setup_caches(cache_dir)
+    # documents are emitted in parallel already
+    set_inference_jobs(1)
+
+
+def setup(config: CommandLineConfig):
     logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+    setup_caches(config.cache_dir)
+    if config.jobs is not None:
+        set_inference_jobs(config.jobs)
+
+
+def open_sink(
+    config: CommandLineConfig, output: Callable[[str], None] = print
+) -> OutputSink:
+    if config.output_dir:
+        return DirectorySink(config.output_dir, per_target=len(config.targets) > 1)
+    if config.output:
+        return FileSink(config.output)
+    return CallbackSink(output)
 
+
+def load_models(
+    config: CommandLineConfig, content: Union[str, io.TextIOBase]
+) -> Iterator[ModelDefinition]:
     if config.format or config.lang:
+        if config.format and is_line_format(config.format) and hasattr(content, "name"):
+            # read record by record by the parser
+            example = ExampleInput(format=config.format, file=content.name)
+            return iter([ModelDefinition(name="stdin", example=example)])
+        if not isinstance(content, str):
+            content = content.read()
         if config.format:
             key = "example"
             value = ExampleInput(format=config.format, text=content)
@@ -54,17 +151,275 @@ def main(
         else:
             raise Exception("Must specify either format or lang")
         model = ModelDefinition(name="stdin", **{key: value})
-        models = [model]
+        return iter([model])
     else:
-        models = read_model_definition(content)
-    emitter = EMITTER_REGISTRY.find_emitter(config.target)
+        return read_model_definition(content)
+
+
+def find_emitter(target: str) -> Emitter:
+    emitter = EMITTER_REGISTRY.find_emitter(target)
     if emitter is None:
-        raise Exception(f"Could not find emitter for {config.target}")
-    for loaded_model in models:
-        output(emitter.emit_model(config.target, loaded_model))
+        raise Exception(f"Could not find emitter for {target}")
+    return emitter
+
+
+def require_raw_value(targets: List[str], model: ModelDefinition):
+    """
+    Parses the model keeping only what the emitters of targets need of the examples
+    """
+    for target in targets:
+        emitter = find_emitter(target)
+        model.require_raw_value(getattr(emitter, "raw_value", RAW_VALUE_KEEP))
+
+
+def emit_model(target: str, model: ModelDefinition) -> str:
+    require_raw_value([target], model)
+    return find_emitter(target).emit_model(target, model)
+
+
+def emit_targets(targets: List[str], model: ModelDefinition) -> List[str]:
+    """
+    Emits the model for every target, the model is parsed only once
+    """
+    require_raw_value(targets, model)
+    return [emit_model(target, model) for target in targets]
+
+
+def find_emitters(targets: List[str]):
+    for target in targets:
+        if EMITTER_REGISTRY.find_emitter(target) is None:
+            raise Exception(f"Could not find emitter for {target}")
+
+
+def _emit_targets_task(task: Tuple[List[str], ModelDefinition]) -> List[str]:
+    return emit_targets(*task)
+
+
+def expand_files(patterns: List[str]) -> List[str]:
+    files = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matched = sorted(glob.glob(pattern, recursive=True))
+            if not matched:
+                logging.warning("Pattern %s matched no file", pattern)
+        else:
+            matched = [pattern]
+        for file in matched:
+            if file not in files:
+                files.append(file)
+    return files
+
+
+@api_beartype
+def main(
+    config: CommandLineConfig,
+    content: Union[str, io.TextIOBase],
+    output: Callable[[str], None] = print,
+):
+    setup(config)
+
+    targets = config.targets
+    find_emitters(targets)
+    with open_sink(config, output) as sink:
+        for loaded_model in load_models(config, content):
+            for target, result in zip(targets, emit_targets(targets, loaded_model)):
+                sink.write(loaded_model.name, target, result)
+
+
+@api_beartype
+def main_batch(
+    config: CommandLineConfig,
+    patterns: List[str],
+    jobs: Optional[int] = None,
+    output: Callable[[str], None] = print,
+):
+    """
+    Emits every document of every file matched by patterns.
+    Documents are emitted in a process pool, but output keeps the order of files and documents.
+    Every document is parsed once by its worker and emitted for all targets.
+    """
+    setup(config)
+
+    targets = config.targets
+    find_emitters(targets)
+    tasks = []
+    for file in expand_files(patterns):
+        with open(file) as f:
+            for model in load_models(config, f):
+                tasks.append((targets, model))
+
+    def write(results):
+        for (_, model), result in zip(tasks, results):
+            for target, text in zip(targets, result):
+                sink.write(model.name, target, text)
+
+    with open_sink(config, output) as sink:
+        if jobs == 1 or len(tasks) <= 1:
+            write(map(_emit_targets_task, tasks))
+            return
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=setup_worker,
+            initargs=(config.cache_dir,),
+        ) as executor:
+            workers = jobs or os.cpu_count() or 1
+            chunksize = max(1, len(tasks) // (workers * 4))
+            write(executor.map(_emit_targets_task, tasks, chunksize=chunksize))
+
+
+class IncrementalEmitter:
+    """
+    Remembers the output of every document, so that only the changed documents are parsed and emitted again
+    """
+
+    def __init__(self, config: CommandLineConfig):
+        self.config = config
+        self.emitted: Dict[str, List[str]] = {}
+
+    def update(self, content: str, changed_only: bool = False) -> List[Tuple[str, str, str]]:
+        """
+        Returns the name, target and output of every document and target,
+        or with changed_only only of the documents that were emitted again
+        """
+        targets = self.config.targets
+        emitted = {}
+        outputs = []
+        documents = 0
+        changed = 0
+        for model in load_models(self.config, content):
+            documents += 1
+            key = model.raw or model.json()
+            if key in emitted:
+                results = emitted[key]
+            elif key in self.emitted:
+                results = self.emitted[key]
+            else:
+                results = emit_targets(targets, model)
+                changed += 1
+            emitted[key] = results
+            if changed_only and key in self.emitted:
+                continue
+            for target, result in zip(targets, results):
+                outputs.append((model.name, target, result))
+        self.emitted = emitted
+        logging.info("Emitted %d of %d documents", changed, documents)
+        return outputs
+
+
+@api_beartype
+def main_watch(
+    config: CommandLineConfig,
+    output: Callable[[str], None] = print,
+    interval: float = 0.5,
+):
+    setup(config)
+
+    find_emitters(config.targets)
+    if not os.path.isfile(config.file):
+        raise Exception(f"Could not watch {config.file}, it is not a regular file")
+    emitter = IncrementalEmitter(config)
+    last_stat = None
+    try:
+        while True:
+            try:
+                stat = os.stat(config.file)
+                current_stat = (stat.st_mtime_ns, stat.st_size)
+                content = None
+                if current_stat != last_stat:
+                    with open(config.file) as f:
+                        content = f.read()
+            except OSError as e:
+                # editors may replace the file, it is read again at the next poll
+                logging.warning("Could not read %s: %s", config.file, e)
+                time.sleep(interval)
+                continue
+            if content is not None:
+                last_stat = current_stat
+                try:
+                    # a bundled output file is written with every document, other outputs only get the changed ones
+                    outputs = emitter.update(content, changed_only=not config.output)
+                except Exception as e:
+                    logging.error("Could not emit %s: %s", config.file, e)
+                else:
+                    with open_sink(config, output) as sink:
+                        for name, target, result in outputs:
+                            sink.write(name, target, result)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+class EmitService:
+    """
+    Emits models for many targets, remembering the output of recently emitted documents
+    """
+
+    def __init__(self, capacity: int = 4096):
+        self.capacity = capacity
+        self.emitted: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def emit(self, config: CommandLineConfig, content: str) -> List[str]:
+        find_emitters(config.targets)
+        outputs = []
+        for model in load_models(config, content):
+            require_raw_value(config.targets, model)
+            for target in config.targets:
+                key = (target, model.raw or model.json())
+                # only the LRU is locked, requests are parsed and emitted concurrently
+                with self.lock:
+                    result = self.emitted.get(key)
+                    if result is not None:
+                        self.emitted.move_to_end(key)
+                if result is None:
+                    result = emit_model(target, model)
+                    with self.lock:
+                        self.emitted[key] = result
+                        if len(self.emitted) > self.capacity:
+                            self.emitted.popitem(last=False)
+                outputs.append(result)
+        return outputs
+
+    def emit_request(self, query: Dict[str, str], content: str) -> List[str]:
+        config = CommandLineConfig(
+            target=query.get("target", "no_target"),
+            format=query.get("format"),
+            lang=query.get("lang"),
+            file="<request>",
+        )
+        return self.emit(config, content)
+
+
+@api_beartype
+def main_serve(config: CommandLineConfig, address: str):
+    from unidef.server import UnixHTTPServer, create_server
+
+    setup(config)
+
+    server = create_server(address, EmitService())
+    logging.info("Serving on %s", address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if isinstance(server, UnixHTTPServer):
+            os.unlink(address)
 
 
 if __name__ == "__main__":
     args = parser.parse_args()
     config = CommandLineConfig.from_args(args)
-    main(config, open(args.file).read())
+    if args.batch:
+        main_batch(config, args.batch, args.jobs)
+    elif args.watch:
+        main_watch(config)
+    elif args.serve:
+        main_serve(config, args.serve)
+    else:
+        with open(args.file) as f:
+            main(config, f)
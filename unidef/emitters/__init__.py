@@ -1,7 +1,18 @@
+import os
+
+from unidef.languages.common.type_model import RAW_VALUE_KEEP
 from unidef.models.config_model import ModelDefinition
+from unidef.utils.cache import DiskCache, EmissionCache
+
+EMISSION_CACHE = EmissionCache()
+if os.environ.get("UNIDEF_CACHE_DIR"):
+    EMISSION_CACHE.disk = DiskCache(os.environ["UNIDEF_CACHE_DIR"])
 
 
 class Emitter:
+    # what the emitter reads of Traits.RawValue, one of RAW_VALUE_POLICIES
+    raw_value: str = RAW_VALUE_KEEP
+
     def accept(self, target: str) -> bool:
         raise NotImplementedError()
 
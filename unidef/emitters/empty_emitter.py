@@ -1,14 +1,11 @@
-from pydantic import BaseModel
-
 from unidef.emitters import Emitter
-from unidef.languages.common.type_model import DyType, Traits
-from unidef.models import config_model
+from unidef.languages.common.type_model import RAW_VALUE_DROP, DyType
 from unidef.models.config_model import ModelDefinition
-from unidef.utils.formatter import *
-from unidef.utils.typing_ext import List
 
 
 class EmptyEmitter(Emitter):
+    raw_value = RAW_VALUE_DROP
+
     def accept(self, s: str) -> bool:
         return s == "no_target"
 
@@ -1,39 +1,53 @@
-import os
-
 from unidef.emitters import Emitter
 
-from unidef.utils.loader import load_module
+from unidef.utils.loader import LazyPlugin, load_entry_points
 from unidef.utils.typing_ext import *
 
 
 class EmitterRegistry:
-    def __init__(self):
-        self.emitters: List[Emitter] = []
+    def __init__(self, entry_point_group: Optional[str] = None):
+        self.emitters: List[Union[Emitter, LazyPlugin]] = []
+        self.entry_point_group = entry_point_group
+        self.entry_points_loaded = False
 
     def add_emitter(self, parser: Emitter):
         self.emitters.append(parser)
 
-    def find_emitter(self, fmt: str) -> Optional[Emitter]:
+    def add_lazy_emitter(self, name: str, module: str, accept: Callable[[str], bool]):
+        self.emitters.append(LazyPlugin(name, module, accept))
+
+    def _find_emitter(self, fmt: str) -> Optional[Emitter]:
         for p in self.emitters:
             if p.accept(fmt):
+                if isinstance(p, LazyPlugin):
+                    p = p.load()
+                    if p is None or not p.accept(fmt):
+                        continue
                 return p
 
+    def find_emitter(self, fmt: str) -> Optional[Emitter]:
+        emitter = self._find_emitter(fmt)
+        if emitter is None and self.entry_point_group and not self.entry_points_loaded:
+            self.entry_points_loaded = True
+            for p in load_entry_points(self.entry_point_group):
+                self.add_emitter(p)
+            emitter = self._find_emitter(fmt)
+        return emitter
 
-EMITTER_REGISTRY = EmitterRegistry()
 
+EMITTER_REGISTRY = EmitterRegistry(entry_point_group="unidef.emitters")
 
-def add_emitter(name: str, emitter: str):
-    module = load_module(name)
-    if module:
-        EMITTER_REGISTRY.add_emitter(module.__dict__[emitter]())
 
+def add_emitter(name: str, module: str, accept: Callable[[str], bool]):
+    EMITTER_REGISTRY.add_lazy_emitter(name, "unidef.emitters." + module, accept)
 
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-add_emitter("python_emitters", "PythonPydanticEmitter")
-add_emitter("python_emitters", "PythonPeeweeEmitter")
-add_emitter("rust_emitters", "RustDataEmitter")
-add_emitter("rust_emitters", "RustJsonEmitter")
-add_emitter("rust_emitters", "RustLangEmitter")
-add_emitter("sql_model", "SqlEmitter")
-add_emitter("empty_emitter", "EmptyEmitter")
+add_emitter(
+    "PythonPydanticEmitter", "python_emitters", lambda s: s == "python_pydantic"
+)
+add_emitter("PythonPeeweeEmitter", "python_emitters", lambda s: s == "python_peewee")
+add_emitter("RustDataEmitter", "rust_emitters", lambda s: s == "rust")
+add_emitter("RustJsonEmitter", "rust_emitters", lambda s: "rust" in s and "json" in s)
+add_emitter("RustLangEmitter", "rust_emitters", lambda s: s == "rust_lang")
+add_emitter("SqlEmitter", "sql_model", lambda s: s == "sql")
+add_emitter("EmptyEmitter", "empty_emitter", lambda s: s == "no_target")
@@ -1,10 +1,14 @@
-from unidef.emitters import Emitter
+from unidef.emitters import EMISSION_CACHE, Emitter
 
-from unidef.languages.common.type_model import DyType
+from unidef.languages.common.type_model import (RAW_VALUE_DROP,
+                                                RAW_VALUE_KEEP, DyType)
 from unidef.models.config_model import ModelDefinition
 
 
 class RustDataEmitter(Emitter):
+    # get_raw_data() returns the text of the model definition, not Traits.RawValue
+    raw_value = RAW_VALUE_DROP
+
     def accept(self, s: str) -> bool:
         return s == "rust"
 
@@ -17,10 +21,12 @@ class RustDataEmitter(Emitter):
     def emit_type(self, target: str, ty: DyType) -> str:
         from unidef.languages.rust.rust_data_emitter import emit_rust_type
 
-        return emit_rust_type(ty)
+        return EMISSION_CACHE.emit(target, ty, lambda: emit_rust_type(ty))
 
 
 class RustJsonEmitter(Emitter):
+    raw_value = RAW_VALUE_KEEP
+
     def accept(self, target: str) -> bool:
         return "rust" in target and "json" in target
 
@@ -40,6 +46,8 @@ class RustJsonEmitter(Emitter):
 
 
 class RustLangEmitter(Emitter):
+    raw_value = RAW_VALUE_DROP
+
     def accept(self, s: str) -> bool:
         return s == "rust_lang"
 
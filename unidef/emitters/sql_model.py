@@ -1,11 +1,13 @@
-from unidef.emitters import Emitter
-from unidef.languages.common.type_model import DyType, FieldType, Traits
+from unidef.emitters import EMISSION_CACHE, Emitter
+from unidef.languages.common.type_model import (RAW_VALUE_DROP, DyType,
+                                                FieldType, Traits)
+from unidef.models.base_model import TraitSwitch
 from unidef.models.config_model import ModelDefinition
 from unidef.utils.name_convert import *
 
 
 def get_real(ty: DyType) -> str:
-    assert ty.get_field(Traits.Floating), True
+    assert ty.has(Traits.Floating), True
     bits = ty.get_field(Traits.BitSize)
     if bits == 32:
         return "float"
@@ -16,7 +18,7 @@ def get_real(ty: DyType) -> str:
 
 
 def get_integer(ty: DyType) -> str:
-    assert ty.get_field(Traits.Integer), True
+    assert ty.has(Traits.Integer), True
     bits = ty.get_field(Traits.BitSize)
 
     if bits < 32:
@@ -29,40 +31,56 @@ def get_integer(ty: DyType) -> str:
         raise NotImplementedError()
 
 
+SQL_TYPE_KINDS = TraitSwitch(
+    Traits.Floating,
+    Traits.Integer,
+    Traits.String,
+    Traits.Null,
+    Traits.Bool,
+    Traits.Struct,
+    Traits.Enum,
+    Traits.AllValue,
+)
+
+
 def map_type_to_ddl(ty: DyType) -> str:
     assert ty is not None
-    if ty.get_field(Traits.Floating):
+    kind = SQL_TYPE_KINDS.match(ty)
+    if kind is Traits.Floating:
         return get_real(ty)
 
     if ty.get_field(Traits.TsUnit):
         return "timestamp without time zone"
 
-    if ty.get_field(Traits.Integer):
+    if kind is Traits.Integer:
         return get_integer(ty)
 
-    if ty.get_field(Traits.String) or ty.get_field(Traits.Null):
+    if kind is Traits.String or kind is Traits.Null:
         return "text"
 
-    if ty.get_field(Traits.Bool):
+    if kind is Traits.Bool:
         return "bool"
 
-    if ty.get_field(Traits.Struct):
+    if kind is Traits.Struct:
         return "jsonb"
 
-    if ty.get_field(Traits.Enum):
-        if ty.get_field(Traits.SimpleEnum):
+    if kind is Traits.Enum:
+        if ty.has(Traits.SimpleEnum):
             return "text"
         else:
             return "jsonb"
+
+    if kind is Traits.AllValue:
+        return "jsonb"
     raise Exception("Cannot map {} to sql type".format(ty.get_field(Traits.TypeName)))
 
 
 def get_field(field: FieldType) -> str:
     base = to_snake_case(field.field_name) + " " + map_type_to_ddl(field.field_type)
-    if field.get_field(Traits.Primary):
+    if field.has(Traits.Primary):
         base += " primary key"
 
-    if not field.get_field(Traits.Nullable):
+    if not field.has(Traits.Nullable):
         base += " not null"
 
     return base
@@ -86,11 +104,13 @@ def emit_field_names_from_model(model: DyType) -> str:
 
 
 class SqlEmitter(Emitter):
+    raw_value = RAW_VALUE_DROP
+
     def accept(self, s: str) -> bool:
         return s == "sql"
 
     def emit_model(self, target: str, model: ModelDefinition) -> str:
-        return emit_schema_from_model(model.get_parsed())
+        return self.emit_type(target, model.get_parsed())
 
     def emit_type(self, target: str, ty: DyType) -> str:
-        return emit_schema_from_model(ty)
+        return EMISSION_CACHE.emit(target, ty, lambda: emit_schema_from_model(ty))
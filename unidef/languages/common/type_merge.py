@@ -0,0 +1,368 @@
+from typing import Callable, Hashable, List, Tuple
+
+from unidef.languages.common.type_model import *
+
+# types of the same kind are merged by widening, types of different kinds into a union
+MERGE_KINDS = TraitSwitch(
+    Traits.Union,
+    Traits.Null,
+    Traits.Struct,
+    Traits.Vector,
+    Traits.Bool,
+    Traits.StringWrapped,
+    Traits.String,
+    Traits.Numeric,
+    Traits.Map,
+    Traits.AllValue,
+)
+
+
+MERGED_CHILDREN = (Traits.Struct, Traits.Vector, Traits.Union)
+
+
+def merge_kind(ty: DyType) -> Optional[Trait]:
+    kind = MERGE_KINDS.match(ty)
+    # numbers wrapped in strings are strings as well
+    if kind is Traits.StringWrapped:
+        return Traits.String
+    return kind
+
+
+def with_nullable(ty: DyType) -> DyType:
+    if ty.has(Traits.Nullable):
+        return ty
+    return ty.copy().replace_field(Traits.Nullable(True))
+
+
+def without_nullable(ty: DyType) -> DyType:
+    if not ty.has(Traits.Nullable):
+        return ty
+    return ty.copy().remove_field(Traits.Nullable)
+
+
+def widen_numbers(a: DyType, b: DyType) -> DyType:
+    """
+    Integers widen to the larger size, signed if either is signed; integers and floats widen to f64
+    """
+    bits = max(a.get_field(Traits.BitSize), b.get_field(Traits.BitSize))
+    if a.has(Traits.Floating) or b.has(Traits.Floating):
+        if not (a.has(Traits.Floating) and b.has(Traits.Floating)):
+            bits = 64
+        ty = Types.Double if bits > 32 else Types.Float
+    else:
+        signed = a.has(Traits.Signed) or b.has(Traits.Signed)
+        for x in [a, b]:
+            # an unsigned integer needs a larger signed one
+            if signed and not x.has(Traits.Signed) and x.get_field(Traits.BitSize) >= bits:
+                bits = min(bits * 2, 128)
+        ty = getattr(Types, ("I" if signed else "U") + str(bits))
+
+    ts_unit = a.get_field(Traits.TsUnit) or b.get_field(Traits.TsUnit)
+    if ts_unit and ty is Types.I64:
+        ty = timestamp_type(ts_unit)
+    elif ts_unit:
+        ty = intern_type(
+            ty.copy()
+                .append_field(Traits.TsUnit(ts_unit))
+                .replace_field(Traits.TypeName("timestamp"))
+        )
+    if a.has(Traits.StringWrapped) and b.has(Traits.StringWrapped):
+        ty = string_wrapped(ty)
+    return ty
+
+
+def merge_strings(a: DyType, b: DyType) -> DyType:
+    if a.has(Traits.String):
+        return a
+    if b.has(Traits.String):
+        return b
+    return widen_numbers(a, b)
+
+
+# the pairs of types to merge first, and how to build the merged type from their merged types
+MergeStep = Tuple[List[Tuple[DyType, DyType]], Callable[[List[DyType]], DyType]]
+
+
+def merged(ty: DyType) -> MergeStep:
+    return [], lambda types: ty
+
+
+def struct_merges(a: StructType, b: StructType) -> MergeStep:
+    """
+    Fields missing in either struct are nullable
+    """
+    matched = [(field, b.get_field_by_name(field.field_name)) for field in a.fields]
+
+    def build(types: List[DyType]) -> DyType:
+        types = iter(types)
+        fields = []
+        for field, other in matched:
+            if other is None:
+                field_type = with_nullable(field.field_type)
+            else:
+                field_type = next(types)
+            if field_type is not field.field_type:
+                field = field.copy()
+                field.field_type = field_type
+            fields.append(field)
+        for field in b.fields:
+            if a.get_field_by_name(field.field_name) is None:
+                field = field.copy()
+                field.field_type = with_nullable(field.field_type)
+                fields.append(field)
+
+        if all(x is y for x, y in zip(fields, a.fields)) and len(fields) == len(a.fields):
+            return a
+        ty = a.copy()
+        ty.fields = fields
+        return ty
+
+    pairs = [(field.field_type, other.field_type) for field, other in matched if other is not None]
+    return pairs, build
+
+
+def vector_merges(a: DyType, b: DyType) -> MergeStep:
+    element = a.get_field(Traits.Generics)[0]
+
+    def build(types: List[DyType]) -> DyType:
+        if types[0] is element:
+            return a
+        ty = a.copy()
+        ty.generics = [types[0]]
+        return ty
+
+    return [(element, b.get_field(Traits.Generics)[0])], build
+
+
+def union_merges(a: DyType, b: DyType) -> MergeStep:
+    """
+    Merges every variant of b into the variant of a of the same kind, or adds it to the variants
+    """
+    variants = list(a.generics) if a.has(Traits.Union) else [a]
+    others = b.generics if b.has(Traits.Union) else [b]
+    pairs = []
+    # the index of the variant that every pair merges into
+    targets = []
+    # variants of b of a kind that is merged already, merged one after the other once the children are merged
+    later = []
+    for other in others:
+        kind = merge_kind(other)
+        for i, variant in enumerate(variants):
+            if merge_kind(variant) is kind:
+                if i in targets:
+                    later.append((i, other))
+                else:
+                    pairs.append((variant, other))
+                    targets.append(i)
+                break
+        else:
+            variants.append(other)
+
+    def build(types: List[DyType]) -> DyType:
+        result = list(variants)
+        for i, ty in zip(targets, types):
+            result[i] = ty
+        for i, other in later:
+            result[i] = merge_types(result[i], other)
+        return UnionType(*result)
+
+    return pairs, build
+
+
+def is_unknown(ty: DyType) -> bool:
+    # types may be copies of Types.AllValue, after they are unpickled
+    return ty is Types.AllValue or (
+        ty.has(Traits.AllValue) and not ty.has(Traits.Union) and ty == Types.AllValue
+    )
+
+
+def merge_step(a: DyType, b: DyType) -> MergeStep:
+    """
+    Merges a and b, after the pairs of their children are merged
+    """
+    if a is b or is_unknown(b):
+        return merged(a)
+    if is_unknown(a):
+        return merged(b)
+    kind_a = merge_kind(a)
+    kind_b = merge_kind(b)
+    # structs and vectors are compared while they are merged
+    if kind_a is kind_b and kind_a not in MERGED_CHILDREN and a == b:
+        return merged(a)
+    if kind_a is Traits.Null:
+        return merged(with_nullable(b))
+    if kind_b is Traits.Null:
+        return merged(with_nullable(a))
+
+    nullable = a.has(Traits.Nullable) or b.has(Traits.Nullable)
+    a = without_nullable(a)
+    b = without_nullable(b)
+    if kind_a is Traits.Union or kind_b is Traits.Union or kind_a is not kind_b:
+        step = union_merges(a, b)
+    elif kind_a is Traits.Struct:
+        step = struct_merges(a, b)
+    elif kind_a is Traits.Vector:
+        step = vector_merges(a, b)
+    elif kind_a is Traits.String:
+        step = merged(merge_strings(a, b))
+    elif kind_a is Traits.Numeric:
+        step = merged(widen_numbers(a, b))
+    elif a == b:
+        step = merged(a)
+    else:
+        step = union_merges(a, b)
+    if not nullable:
+        return step
+    pairs, build = step
+    return pairs, lambda types: with_nullable(build(types))
+
+
+@beartype
+def merge_types(a: DyType, b: DyType) -> DyType:
+    """
+    The type of the values of either type a or type b, as inferred from samples of the same data.
+    Null makes the other type nullable, and Types.AllValue, the element type of empty arrays, says nothing.
+    a and b are not changed, the result may share children with them.
+    The children are merged first with an explicit stack, and a pair that is met again in a cycle merges into a
+    """
+    results = {}
+    # every merged pair is kept alive, so that the ids in results are not reused
+    pairs_alive = []
+    # (a, b, the step of the pair once its children are pushed)
+    stack = [(a, b, None)]
+    while stack:
+        x, y, step = stack.pop()
+        key = (id(x), id(y))
+        if step is not None:
+            pairs, build = step
+            results[key] = build([results[(id(p), id(q))] for p, q in pairs])
+            continue
+        if key in results:
+            continue
+        pairs_alive.append((x, y))
+        pairs, build = merge_step(x, y)
+        if not pairs:
+            results[key] = build([])
+            continue
+        results[key] = x
+        stack.append((x, y, (pairs, build)))
+        for p, q in reversed(pairs):
+            stack.append((p, q, None))
+    return results[(id(a), id(b))]
+
+
+def unify_types(types: Iterable[DyType]) -> DyType:
+    """
+    Merges types one by one, Types.AllValue if there is none
+    """
+    ty = Types.AllValue
+    for other in types:
+        ty = merge_types(ty, other)
+    return ty
+
+
+def example_shape(
+        obj: Any, prefix: str = "", sampling: ArraySampling = DEFAULT_ARRAY_SAMPLING
+) -> Hashable:
+    """
+    Examples of the same shape infer the same type. Scalars are identified by the hash of their shared type
+    """
+    if isinstance(obj, dict):
+        return (
+            "{",
+            tuple(
+                (key, example_shape(value, prefix_join(prefix, key), sampling))
+                for key, value in obj.items()
+            ),
+        )
+    if isinstance(obj, list):
+        return "[", frozenset(
+            example_shape(value, prefix, sampling) for value in sampling.sample(obj)
+        )
+    ty = infer_scalar_type(obj, prefix)
+    if ty is None:
+        raise Exception(f"Could not infer type from {obj}")
+    return ty.structural_hash()
+
+
+class TypeMerger:
+    """
+    Folds the types inferred from samples into one type.
+    Only the merged type is kept, so memory is bounded by the size of the schema, not by the number of samples.
+    Merging is idempotent, so samples of a shape that was merged already are skipped without inferring their type
+    """
+
+    def __init__(
+            self,
+            prefix: str = "",
+            raw_value: str = RAW_VALUE_DROP,
+            sampling: ArraySampling = DEFAULT_ARRAY_SAMPLING,
+            shapes_capacity: int = 4096,
+    ):
+        self.prefix = prefix
+        # the policy of Traits.RawValue for the first sample
+        self.raw_value = raw_value
+        self.sampling = sampling
+        self.merged: Optional[DyType] = None
+        self.samples = 0
+        self.shapes: Set[Hashable] = set()
+        self.shapes_capacity = shapes_capacity
+
+    def add_type(self, ty: DyType) -> __qualname__:
+        if self.merged is None:
+            self.merged = ty
+        else:
+            self.merged = merge_types(self.merged, ty)
+        self.samples += 1
+        return self
+
+    def add_sample(self, obj: Union[str, int, float, dict, list, None]) -> __qualname__:
+        if self.samples == 0:
+            return self.add_type(
+                infer_type_from_example(obj, self.prefix, self.raw_value, self.sampling)
+            )
+        shape = example_shape(obj, self.prefix, self.sampling)
+        if shape in self.shapes:
+            self.samples += 1
+            return self
+        # the first sample is not merged with anything, its shape is remembered once it is
+        self.add_type(
+            infer_type_from_example(obj, self.prefix, RAW_VALUE_DROP, self.sampling)
+        )
+        if len(self.shapes) >= self.shapes_capacity:
+            self.shapes.clear()
+        self.shapes.add(shape)
+        return self
+
+    def merge(self, other: "TypeMerger") -> __qualname__:
+        """
+        Adds the samples merged by other. Merging is associative, so mergers of parts of the samples can be
+        combined in any grouping, but the order of fields follows the order of merging
+        """
+        if other.merged is not None:
+            self.add_type(other.merged)
+            self.samples += other.samples - 1
+        return self
+
+    def __getstate__(self):
+        # the shapes are only a shortcut, and may be many
+        state = dict(self.__dict__)
+        state["shapes"] = set()
+        return state
+
+    def result(self) -> DyType:
+        if self.merged is None:
+            raise Exception("Could not infer type without samples")
+        ty = self.merged
+        if ty.is_frozen():
+            ty = ty.copy()
+        return ty
+
+
+def infer_type_from_samples(
+        samples: Iterable[Union[str, int, float, dict, list, None]], prefix: str = ""
+) -> DyType:
+    merger = TypeMerger(prefix)
+    for sample in samples:
+        merger.add_sample(sample)
+    return merger.result()
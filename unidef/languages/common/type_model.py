@@ -1,4 +1,7 @@
+import operator
 import random
+import time
+from collections import OrderedDict
 
 from unidef.models.base_model import *
 from unidef.utils.name_convert import *
@@ -20,6 +23,7 @@ class Traits:
     ValueTypes = Trait(key="value", ty=list, default=[])
     Parent = Trait(key="parent", ty=Any)
     StructFields = Trait(key="fields", ty=list)
+    FieldName = Trait(key="field_name", ty=str)
     Struct = Trait(key="struct", ty=bool, default=False)
     Enum = Trait(key="enum", ty=bool)
     TypeRef = Trait(key="type_ref", ty=str)
@@ -46,6 +50,7 @@ class Traits:
     Null = Trait(key="null", ty=bool)
     Object = Trait(key="object", ty=bool)
     AllValue = Trait(key="all_value", ty=bool)
+    Union = Trait(key="union", ty=bool)
 
     NotInferredType = Trait(key="not_inferred_type", ty=bool)
 
@@ -123,18 +128,35 @@ class AnyhowResultType(GenericType):
 
 
 class VectorType(GenericType):
+    """
+    The types of the elements are unified into the only generic: identical types collapse,
+    numbers widen and values of different kinds make a union
+    """
+
     kind: str = "vector"
     name: str = "vector"
     vector: bool = True
-    all_types: List[DyType]
 
     def __init__(self, value: DyType, alternative_types: List[DyType] = None, **kwargs):
-        if alternative_types is None:
-            all_types = [value]
-        else:
-            all_types = alternative_types + [value]
+        if alternative_types:
+            from unidef.languages.common.type_merge import unify_types
 
-        super().__init__(generics=[value], all_types=all_types, **kwargs)
+            value = unify_types([value, *alternative_types])
+        super().__init__(generics=[value], **kwargs)
+
+
+class UnionType(GenericType):
+    """
+    One of the generics. Emitters without unions treat it as any value
+    """
+
+    kind: str = "union"
+    name: str = "union"
+    union: bool = True
+    all_value: bool = True
+
+    def __init__(self, *variants: DyType, **kwargs):
+        super().__init__(generics=list(variants), **kwargs)
 
 
 class IntegerType(DyType):
@@ -176,20 +198,47 @@ class StructType(DyType):
     fields: List[FieldType]
     is_data_type: bool = True
 
-    def get_by_path(self, path: List[str], past_path: List[str] = None) -> Optional[DyType]:
+    def get_field_by_name(self, name: str) -> Optional[FieldType]:
+        """
+        The first field called name, looked up in an index that follows the order of fields
+        """
+        fields = self.fields
+        cached = self.__dict__.get("_field_index")
+        # a new, resized or changed fields list invalidates the index, e.g. fields[0] = FieldType(...)
+        if (
+                cached is None
+                or cached[0] is not fields
+                or len(cached[1]) != len(fields)
+                or not all(map(operator.is_, cached[1], fields))
+        ):
+            index = {}
+            for field in fields:
+                index.setdefault(field.field_name, field)
+            cached = (fields, tuple(fields), index)
+            self.__dict__["_field_index"] = cached
+        return cached[2].get(name)
+
+    def get_by_path(
+            self, path: Union[List[str], str], past_path: List[str] = None
+    ) -> Optional[DyType]:
+        """
+        path is a list of field names, or a dotted path like "a.b.c"
+        """
+        if isinstance(path, str):
+            path = path.split(".")
         if past_path is None:
             past_path = []
 
-        path, pathx = path[0], path[1:]
-        for field in self.fields:
-            if field.field_name == path:
-                if pathx:
-                    if isinstance(field.field_type, StructType):
-                        return field.field_type.get_by_path(pathx, past_path + [path])
-                    else:
-                        raise Exception(f"{past_path}.{path} is not struct")
-                else:
-                    return field.field_type
+        struct = self
+        for i, name in enumerate(path):
+            if i > 0:
+                if not isinstance(struct, StructType):
+                    raise Exception(f"{past_path + path[:i - 1]}.{path[i - 1]} is not struct")
+            field = struct.get_field_by_name(name)
+            if field is None:
+                return None
+            struct = field.field_type
+        return struct
 
 
 class VariantType(DyType):
@@ -245,10 +294,31 @@ class Types:
     )
 
 
+TYPE_INTERNER = Interner()
+
+
+def intern_type(ty: DyType) -> DyType:
+    """
+    Returns the shared, frozen instance of ty. Use ty.copy() to get a mutable one
+    """
+    return TYPE_INTERNER.intern(ty)
+
+
+for _name, _ty in list(Types.__dict__.items()):
+    if isinstance(_ty, DyType):
+        setattr(Types, _name, intern_type(_ty))
+
+
 class TypeRegistry(BaseModel):
     types: Dict[str, DyType] = {}
     traits = {}
     type_detector: list = []
+    # LRU of the types found by type_detector, None if no detector found the type
+    detected: Dict[str, Optional[DyType]] = OrderedDict()
+    detected_capacity: int = 4096
+    hits: int = 0
+    misses: int = 0
+    detector_time: float = 0.0
 
     @beartype
     def insert_type(self, ty: DyType):
@@ -268,13 +338,44 @@ class TypeRegistry(BaseModel):
 
     @beartype
     def get_type(self, name: str) -> Optional[DyType]:
+        """
+        Returns a frozen type shared by all callers, copy it to change it
+        """
         val = self.types.get(name)
         if val:
             return val
+        if name in self.detected:
+            self.hits += 1
+            self.detected.move_to_end(name)
+            return self.detected[name]
+        self.misses += 1
+        begin = time.perf_counter()
+        try:
+            val = self.detect_type(name)
+        finally:
+            self.detector_time += time.perf_counter() - begin
+        self.detected[name] = val
+        if len(self.detected) > self.detected_capacity:
+            self.detected.popitem(last=False)
+        return val
+
+    def detect_type(self, name: str) -> Optional[DyType]:
         for f in self.type_detector:
             val = f(name)
             if val:
-                return val
+                return intern_type(val)
+
+    def add_type_detector(self, detector: Callable[[str], Optional[DyType]]):
+        self.type_detector.append(detector)
+        self.detected.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            detector_time=self.detector_time,
+            detected=len(self.detected),
+        )
 
     @beartype
     def get_trait(self, name: str) -> Optional[Trait]:
@@ -326,8 +427,44 @@ def detect_timestamp_unit(inputtext: Union[str, int, float]) -> str:
         return "sec"
 
 
+# the shared types derived from shared types, by the structural hash of the base type
+_STRING_WRAPPED_TYPES: Dict[str, DyType] = {}
+_TIMESTAMP_TYPES: Dict[str, DyType] = {}
+_FROM_JSON_TYPES: Dict[str, DyType] = {}
+
+
 def string_wrapped(trait: DyType) -> DyType:
-    return trait.copy().replace_field(Traits.StringWrapped)
+    if trait.is_interned():
+        wrapped = _STRING_WRAPPED_TYPES.get(trait.structural_hash())
+        if wrapped is not None:
+            return wrapped
+    wrapped = intern_type(trait.copy().replace_field(Traits.StringWrapped(True)))
+    if trait.is_interned():
+        _STRING_WRAPPED_TYPES[trait.structural_hash()] = wrapped
+    return wrapped
+
+
+def from_json_type(ty: DyType) -> DyType:
+    """
+    The shared instance of an interned type with Traits.FromJson
+    """
+    marked = _FROM_JSON_TYPES.get(ty.structural_hash())
+    if marked is None:
+        marked = intern_type(ty.copy().replace_field(Traits.FromJson(True)))
+        _FROM_JSON_TYPES[ty.structural_hash()] = marked
+    return marked
+
+
+def timestamp_type(unit: str) -> DyType:
+    ty = _TIMESTAMP_TYPES.get(unit)
+    if ty is None:
+        ty = intern_type(
+            Types.I64.copy()
+                .append_field(Traits.TsUnit(unit))
+                .replace_field(Traits.TypeName("timestamp"))
+        )
+        _TIMESTAMP_TYPES[unit] = ty
+    return ty
 
 
 def prefix_join(prefix: str, name: str) -> str:
@@ -337,99 +474,239 @@ def prefix_join(prefix: str, name: str) -> str:
         return name
 
 
-@beartype
-def infer_type_from_example(
-        obj0: Union[str, int, float, dict, list, None], prefix0: str = ""
-) -> DyType:
-    def inner(obj, prefix) -> DyType:
-        if obj is None:
-            return Types.NoneType
-
-        if isinstance(obj, str):
-            if "." in obj:
-                try:
-                    float(obj)
-                    return string_wrapped(Types.Double)
-                except:
-                    pass
+def infer_scalar_type(obj: Any, prefix: str = "") -> Optional[DyType]:
+    """
+    The shared type of a value that is neither a list nor a dict, or None
+    """
+    if obj is None:
+        return Types.NoneType
+
+    if isinstance(obj, str):
+        if "." in obj:
             try:
-                int(obj)
-                return string_wrapped(Types.I64)
+                float(obj)
+                return string_wrapped(Types.Double)
             except:
                 pass
+        try:
+            int(obj)
+            return string_wrapped(Types.I64)
+        except:
+            pass
 
-            return Types.String
-        elif isinstance(obj, bool):
-            return Types.Bool
-        elif isinstance(obj, int):
-            prefix = to_snake_case(prefix)
-
-            ty = Types.I64
-            # TODO: detect words in the field name without prefix
-            if "_ts" in prefix or "time" in prefix or "_at" in prefix:
-                ty = (
-                    ty.copy()
-                        .append_field(Traits.TsUnit(detect_timestamp_unit(obj)))
-                        .replace_field(Traits.TypeName("timestamp"))
-                )
+        return Types.String
+    elif isinstance(obj, bool):
+        return Types.Bool
+    elif isinstance(obj, int):
+        prefix = to_snake_case(prefix)
+
+        # TODO: detect words in the field name without prefix
+        if "_ts" in prefix or "time" in prefix or "_at" in prefix:
+            return timestamp_type(detect_timestamp_unit(obj))
+
+        return Types.I64
+    elif isinstance(obj, float):
+        return Types.Double
+    return None
 
-            return ty
-        elif isinstance(obj, float):
-            return Types.Double
+
+# which elements of an array are inferred
+SAMPLE_ALL = "all"
+SAMPLE_FIRST = "first"
+SAMPLE_STRIDE = "stride"
+SAMPLE_RESERVOIR = "reservoir"
+SAMPLING_POLICIES = [SAMPLE_ALL, SAMPLE_FIRST, SAMPLE_STRIDE, SAMPLE_RESERVOIR]
+
+
+class ArraySampling:
+    """
+    Selects at most size elements of an array: the first ones, evenly spaced ones,
+    or a uniform random sample like reservoir sampling would draw
+    """
+
+    def __init__(self, policy: str = SAMPLE_STRIDE, size: int = 100):
+        assert policy in SAMPLING_POLICIES, policy
+        assert size > 0
+        self.policy = policy
+        self.size = size
+
+    def sample(self, values: list) -> list:
+        n = len(values)
+        if self.policy == SAMPLE_ALL or n <= self.size:
+            return values
+        if self.policy == SAMPLE_FIRST:
+            return values[: self.size]
+        if self.policy == SAMPLE_STRIDE:
+            return values[:: -(-n // self.size)]
+        # seeded by the length, so that the same example infers the same type
+        indexes = random.Random(n).sample(range(n), self.size)
+        return [values[i] for i in sorted(indexes)]
+
+    def __repr__(self):
+        return f"ArraySampling({self.policy!r}, {self.size})"
+
+
+DEFAULT_ARRAY_SAMPLING = ArraySampling()
+
+
+# what Traits.RawValue of an inferred type holds, from the least to the most memory
+RAW_VALUE_DROP = "drop"
+# the text the example was parsed from
+RAW_VALUE_TEXT = "text"
+# the parsed example
+RAW_VALUE_KEEP = "keep"
+RAW_VALUE_POLICIES = [RAW_VALUE_DROP, RAW_VALUE_TEXT, RAW_VALUE_KEEP]
+
+
+def strongest_raw_value_policy(policies: Iterable[str]) -> str:
+    """
+    The policy keeping enough for all of policies
+    """
+    return max(policies, key=RAW_VALUE_POLICIES.index, default=RAW_VALUE_DROP)
+
+
+def apply_raw_value_policy(
+        ty: DyType, policy: str, text: Optional[str] = None
+) -> DyType:
+    """
+    Replaces the Traits.RawValue attached by infer_type_from_example according to policy
+    """
+    assert policy in RAW_VALUE_POLICIES, policy
+    if policy == RAW_VALUE_KEEP or ty.get_field_opt(Traits.RawValue) is None:
+        return ty
+    if ty.is_frozen():
+        ty = ty.copy()
+    if policy == RAW_VALUE_TEXT and text is not None:
+        return ty.replace_field(Traits.RawValue(text))
+    return ty.remove_field(Traits.RawValue)
+
+
+@beartype
+def infer_type_from_example(
+        obj0: Union[str, int, float, dict, list, None],
+        prefix0: str = "",
+        raw_value: str = RAW_VALUE_KEEP,
+        sampling: ArraySampling = DEFAULT_ARRAY_SAMPLING,
+) -> DyType:
+    """
+    With RAW_VALUE_KEEP, obj0 is attached to the returned type as Traits.RawValue. Nested types never keep their value.
+    The element type of an array is merged from the types of the elements selected by sampling
+    """
+    def inner(obj, prefix) -> DyType:
+        scalar = infer_scalar_type(obj, prefix)
+        if scalar is not None:
+            return scalar
         elif isinstance(obj, list):
-            content = Types.AllValue
-            others = []
-            if len(obj):
-                content = infer_type_from_example(obj[0], prefix)
-                others = [infer_type_from_example(o, prefix) for o in obj[1:]]
-            return VectorType(content, others)
+            from unidef.languages.common.type_merge import unify_types
+
+            # unified as they are inferred, only the unified type is kept
+            return VectorType(
+                unify_types(
+                    infer_type_from_example(value, prefix, RAW_VALUE_DROP, sampling)
+                    for value in sampling.sample(obj)
+                )
+            )
         elif isinstance(obj, dict):
             fields = []
             for key, value in obj.items():
-                value = infer_type_from_example(value, prefix_join(prefix, key))
+                value = infer_type_from_example(
+                    value, prefix_join(prefix, key), RAW_VALUE_DROP, sampling
+                )
                 if value.get_field(Traits.Struct):
                     value.replace_field(Traits.TypeName(prefix_join(prefix, key)))
 
-                for val in value.get_field(Traits.ValueTypes):
-                    if val.get_field(Traits.Struct):
-                        new_name = prefix_join(prefix, key)
-                        if new_name.endswith("s"):
-                            new_name = new_name[:-1]
-                        val.replace_field(Traits.TypeName(new_name))
+                value_types = value.get_field(Traits.ValueTypes)
+                if any(val.get_field(Traits.Struct) for val in value_types):
+                    new_name = prefix_join(prefix, key)
+                    if new_name.endswith("s"):
+                        new_name = new_name[:-1]
+                    value.replace_field(
+                        Traits.ValueTypes(
+                            [
+                                val.copy().replace_field(Traits.TypeName(new_name))
+                                if val.get_field(Traits.Struct)
+                                else val
+                                for val in value_types
+                            ]
+                        )
+                    )
 
                 fields.append(FieldType(field_name=key, field_type=value))
+            # named after the path of the value, e.g. the elements of a vector field
             return StructType(
-                name="struct_" + str(random.randint(0, 1000)),
+                name=prefix or "struct",
                 fields=fields,
                 is_data_type=True,
             )
         raise Exception(f"Could not infer type from {obj}")
 
-    return (
-        inner(obj0, prefix0)
-            .copy()
-            .append_field(Traits.FromJson(True))
-            .append_field(Traits.RawValue(obj0))
-    )
+    ty = inner(obj0, prefix0)
+    if ty.is_interned() and raw_value != RAW_VALUE_KEEP:
+        # scalars keep sharing one instance of every type
+        return from_json_type(ty)
+    # shared types are frozen, the types built here are new and owned by the caller
+    if ty.is_frozen():
+        ty = ty.copy()
+    ty.append_field(Traits.FromJson(True))
+    if raw_value == RAW_VALUE_KEEP:
+        ty.append_field(Traits.RawValue(obj0))
+    return ty
 
 
-def walk_type(node: DyType, process: Callable[[int, DyType], None], depth=0) -> None:
-    if node.get_field(Traits.Struct):
-        for field in node.get_field(Traits.StructFields):
-            walk_type(field, process, depth + 1)
-    elif node.get_field(Traits.Vector):
-        for ty in node.get_field(Traits.Generics):
-            walk_type(ty, process, depth + 1)
-    else:
-        process(depth, node)
+def type_children(node: MixedModel) -> List[MixedModel]:
+    """
+    The types directly inside a type: the fields of a struct, the type of a field, generics and value types
+    """
+    if isinstance(node, FieldType):
+        return [node.field_type]
+    children = []
+    if node.has(Traits.Struct):
+        children.extend(node.get_field(Traits.StructFields) or [])
+    children.extend(node.get_field(Traits.Generics) or [])
+    children.extend(node.get_field(Traits.ValueTypes) or [])
+    return [child for child in children if isinstance(child, MixedModel)]
+
+
+def traverse_type(
+        root: MixedModel,
+        pre: Optional[Callable[[int, MixedModel], Any]] = None,
+        post: Optional[Callable[[int, MixedModel], Any]] = None,
+        key: Optional[Callable[[MixedModel], Any]] = id,
+        children: Callable[[MixedModel], List[MixedModel]] = type_children,
+        depth: int = 0,
+) -> bool:
+    """
+    traverse_model over the types in a type, see type_children
+    """
+    return traverse_model(root, pre, post, key, children, depth)
+
+
+def walk_type(node: DyType, process: Callable[[int, MixedModel], None], depth=0) -> None:
+    """
+    Calls process in pre-order on the leaves below the fields of structs and the elements of vectors.
+    Fields are leaves, the types of fields are not walked
+    """
+
+    def children(ty: MixedModel) -> List[MixedModel]:
+        if ty.get_field(Traits.Struct):
+            return ty.get_field(Traits.StructFields)
+        if ty.get_field(Traits.Vector):
+            return ty.get_field(Traits.Generics)
+        return []
+
+    def pre(depth: int, ty: MixedModel):
+        if not ty.get_field(Traits.Struct) and not ty.get_field(Traits.Vector):
+            process(depth, ty)
+
+    traverse_type(node, pre=pre, key=None, children=children, depth=depth)
 
 
 def walk_type_with_count(
-        node: DyType, process: Callable[[int, int, str, DyType], None]
+        node: DyType, process: Callable[[int, int, str, MixedModel], None]
 ) -> None:
     counts = {}
 
-    def pre_process(depth, ty: DyType):
+    def pre_process(depth, ty: MixedModel):
         name = ty.get_field(Traits.FieldName)
         if name:
             if name not in counts:
@@ -473,7 +750,7 @@ for t in Types.__dict__.values():
     if isinstance(t, DyType):
         GLOBAL_TYPE_REGISTRY.insert_type(t)
 
-GLOBAL_TYPE_REGISTRY.type_detector.append(parse_type_definition)
+GLOBAL_TYPE_REGISTRY.add_type_detector(parse_type_definition)
 
 if __name__ == "__main__":
     print(GLOBAL_TYPE_REGISTRY.list_types())
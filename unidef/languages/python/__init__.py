@@ -1,22 +1,35 @@
-from unidef.emitters import Emitter
-from unidef.languages.common.type_model import DyType, FieldType, Traits
+from unidef.emitters import EMISSION_CACHE, Emitter
+from unidef.languages.common.type_model import (RAW_VALUE_DROP, DyType, FieldType,
+                                                Traits)
+from unidef.models.base_model import TraitSwitch
 from unidef.models.config_model import ModelDefinition
 from unidef.utils.formatter import *
 from unidef.utils.name_convert import to_pascal_case, to_snake_case
 from unidef.utils.typing_ext import *
 
 
+PEEWEE_TYPE_KINDS = TraitSwitch(
+    Traits.Bool,
+    Traits.Integer,
+    Traits.Floating,
+    Traits.String,
+    Traits.Enum,
+    Traits.AllValue,
+)
+
+
 def map_type_to_peewee_model(ty: DyType, args="") -> str:
-    if ty.get_field(Traits.Nullable):
+    if ty.has(Traits.Nullable):
         args += "null=True"
-    if ty.get_field(Traits.Primary):
+    if ty.has(Traits.Primary):
         args += "primary=True"
 
-    if ty.get_field(Traits.Bool):
+    kind = PEEWEE_TYPE_KINDS.match(ty)
+    if kind is Traits.Bool:
         return "BoolField({})".format(args)
     elif ty.get_field(Traits.TsUnit):
         return "DateTimeField()"
-    elif ty.get_field(Traits.Integer):
+    elif kind is Traits.Integer:
         bits = ty.get_field(Traits.BitSize)
         if bits < 32:
             return "SmallIntegerField({})".format(args)
@@ -27,7 +40,7 @@ def map_type_to_peewee_model(ty: DyType, args="") -> str:
         else:
             raise NotImplementedError()
 
-    elif ty.get_field(Traits.Floating):
+    elif kind is Traits.Floating:
         bits = ty.get_field(Traits.BitSize)
         if bits == 32:
             return "FloatField({})".format(args)
@@ -35,15 +48,15 @@ def map_type_to_peewee_model(ty: DyType, args="") -> str:
             return "DoubleField({})".format(args)
         else:
             raise NotImplementedError()
-    elif ty.get_field(Traits.String) or (
-        ty.get_field(Traits.Null) and ty.get_field(Traits.FromJson)
-    ):
+    elif kind is Traits.String or (ty.has(Traits.Null) and ty.has(Traits.FromJson)):
         return "TextField()"
-    elif ty.get_field(Traits.Enum):
-        if ty.get_field(Traits.SimpleEnum):
+    elif kind is Traits.Enum:
+        if ty.has(Traits.SimpleEnum):
             return "TextField({})".format(args)
         else:
             return "BinaryJSONField({})".format(args)
+    elif kind is Traits.AllValue:
+        return "BinaryJSONField({})".format(args)
     return ty.get_field(Traits.TypeName)
 
 
@@ -63,6 +76,11 @@ def map_type_to_pydantic_model(ty: DyType) -> str:
         ty.get_field(Traits.Null) and ty.get_field(Traits.FromJson)
     ):
         base_name = "str"
+    elif ty.get_field(Traits.Union):
+        variants = ty.get_field(Traits.Generics)
+        base_name = "Union[{}]".format(
+            ", ".join(map(map_type_to_pydantic_model, variants))
+        )
     elif ty.exist_field(Traits.Tuple):
         fields = ty.get_field(Traits.Generics)
         base_name = "({})".format(", ".join(map(map_type_to_pydantic_model, fields)))
@@ -170,8 +188,8 @@ class PythonComment(BaseModel):
 class PythonClass(BaseModel):
     name: str
     fields: List[PythonField]
-    comment: PythonComment = None
-    model: Optional[str]
+    comment: Optional[PythonComment] = None
+    model: Optional[str] = None
 
     @staticmethod
     def parse_name(name):
@@ -203,7 +221,8 @@ class PythonClass(BaseModel):
             raise Exception("Unrecognized data model: " + data_model)
         sources.append(TextNode(f"class {self.name}({model})"))
         in_indent_block = []
-        in_indent_block.append(self.comment.transform())
+        if self.comment:
+            in_indent_block.append(self.comment.transform())
         if len(self.fields) == 0:
             in_indent_block.append(LineNode(TextNode("pass")))
         for field in self.fields:
@@ -297,14 +316,18 @@ def emit_struct(root: DyType, data_model) -> SourceNode:
     return BulkNode(sources)
 
 
-def emit_python_model_definition(root: ModelDefinition, data_model) -> SourceNode:
-    sources = []
+def model_comment(root: ModelDefinition) -> List[str]:
     comment = []
     for attr in ["type", "url", "ref", "note"]:
         t = getattr(root, attr)
         if t:
             comment.extend(f"{attr}: {t}".splitlines())
-    comment = PythonComment(comment, python_doc=True)
+    return comment
+
+
+def emit_python_model_definition(root: ModelDefinition, data_model) -> SourceNode:
+    sources = []
+    comment = PythonComment(model_comment(root), python_doc=True)
     parsed = root.get_parsed()
     if parsed.get_field(Traits.Struct):
         for i, struct in enumerate(find_all_structs(parsed)):
@@ -322,30 +345,50 @@ def emit_python_model_definition(root: ModelDefinition, data_model) -> SourceNod
 
 
 class PythonPeeweeEmitter(Emitter):
+    raw_value = RAW_VALUE_DROP
+
     def accept(self, s: str) -> bool:
         return s == "python_peewee"
 
     def emit_model(self, target: str, model: ModelDefinition) -> str:
-        formatter = StructuredFormatter(
-            nodes=[emit_python_model_definition(model, "peewee")]
+        def emit():
+            formatter = StructuredFormatter(
+                nodes=[emit_python_model_definition(model, "peewee")]
+            )
+            return formatter.to_string()
+
+        return EMISSION_CACHE.emit(
+            target, model.get_parsed(), emit, "model", *model_comment(model)
         )
-        return formatter.to_string()
 
     def emit_type(self, target: str, ty: DyType) -> str:
-        formatter = StructuredFormatter(nodes=[emit_struct(ty, "peewee")])
-        return formatter.to_string()
+        def emit():
+            formatter = StructuredFormatter(nodes=[emit_struct(ty, "peewee")])
+            return formatter.to_string()
+
+        return EMISSION_CACHE.emit(target, ty, emit)
 
 
 class PythonPydanticEmitter(Emitter):
+    raw_value = RAW_VALUE_DROP
+
     def accept(self, s: str) -> bool:
         return s == "python_pydantic"
 
     def emit_model(self, target: str, model: ModelDefinition) -> str:
-        formatter = StructuredFormatter(
-            nodes=[emit_python_model_definition(model, "pydantic")]
+        def emit():
+            formatter = StructuredFormatter(
+                nodes=[emit_python_model_definition(model, "pydantic")]
+            )
+            return formatter.to_string()
+
+        return EMISSION_CACHE.emit(
+            target, model.get_parsed(), emit, "model", *model_comment(model)
         )
-        return formatter.to_string()
 
     def emit_type(self, target: str, ty: DyType) -> str:
-        formatter = StructuredFormatter(nodes=[emit_struct(ty, "pydantic")])
-        return formatter.to_string()
+        def emit():
+            formatter = StructuredFormatter(nodes=[emit_struct(ty, "pydantic")])
+            return formatter.to_string()
+
+        return EMISSION_CACHE.emit(target, ty, emit)
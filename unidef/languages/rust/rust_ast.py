@@ -338,54 +338,71 @@ class RustVariableDeclaration(RustAstNode):
     init: Optional[RustAstNode]
 
 
+RUST_TYPE_KINDS = TraitSwitch(
+    Traits.Struct,
+    Traits.Enum,
+    Traits.Tuple,
+    Traits.Vector,
+    Traits.Bool,
+    Traits.AllValue,
+    Traits.Integer,
+    Traits.Floating,
+    Traits.Map,
+    Traits.String,
+    Traits.Unit,
+)
+
+
 def map_type_to_rust(ty: DyType) -> str:
     # if ty.get_field(Traits.ValueType):
     #     return map_type_to_str(ty.get_field(Traits.ValueType))
-    if ty.get_field(Traits.Nullable):
+    if ty.has(Traits.Nullable):
         ty = ty.copy()
         ty.remove_field(Traits.Nullable)
         return "Option<{}>".format(map_type_to_rust(ty))
-    if ty.get_field(Traits.Null) and ty.get_field(Traits.FromJson):
+    if ty.has(Traits.Null) and ty.has(Traits.FromJson):
         return "String"
-    elif ty.get_field(Traits.TsUnit):
+    if ty.get_field(Traits.TsUnit):
         return "TimeStamp" + to_pascal_case(ty.get_field(Traits.TsUnit))
-    elif ty.get_field(Traits.Struct):
+
+    kind = RUST_TYPE_KINDS.match(ty)
+    if kind is Traits.Struct:
         if ty.get_field(Traits.TypeRef):
             return ty.get_field(Traits.TypeRef)
         else:
             return RustStructNode.parse_name(ty.get_field(Traits.TypeName))
-    elif ty.get_field(Traits.Enum):
+    elif kind is Traits.Enum:
         return RustEnumNode.parse_variant_name(ty.get_field(Traits.TypeRef))
-    elif ty.get_field(Traits.Tuple):
+    elif kind is Traits.Tuple:
         return "({})".format(
             ", ".join([map_type_to_rust(t) for t in ty.get_field(Traits.Generics)])
         )
-    elif ty.get_field(Traits.Vector):
+    elif kind is Traits.Vector:
         return "Vec<{}>".format(map_type_to_rust(ty.get_field(Traits.Generics)[0]))
-    elif ty.get_field(Traits.Bool):
+    elif kind is Traits.Bool:
         return "bool"
-    elif ty.get_field(Traits.AllValue):
+    elif kind is Traits.AllValue:
         return "serde_json::Value"
-    elif ty.get_field(Traits.Integer):
+    elif kind is Traits.Integer:
         bits = ty.get_field(Traits.BitSize)
-        if ty.get_field(Traits.Signed):
+        if ty.has(Traits.Signed):
             return "i" + str(bits)
         else:
             return "u" + str(bits)
 
-    elif ty.get_field(Traits.Floating):
+    elif kind is Traits.Floating:
         bits = ty.get_field(Traits.BitSize)
         return "f" + str(bits)
-    elif ty.get_field(Traits.Map):
+    elif kind is Traits.Map:
         key, value = tuple(ty.get_field(Traits.ValueTypes))
         return "HashMap<{}, {}>".format(map_type_to_rust(key), map_type_to_rust(value))
-    elif ty.get_field(Traits.String):
-        if ty.get_field(Traits.Reference):
+    elif kind is Traits.String:
+        if ty.has(Traits.Reference):
             lifetime = ty.get_field(Traits.Lifetime)
             return "&{}str".format(lifetime and "'" + lifetime + " " or "")
         else:
             return "String"
-    elif ty.get_field(Traits.Unit):
+    elif kind is Traits.Unit:
         return "()"
     elif ty.get_field(Traits.TypeRef):
         tr: str = ty.get_field(Traits.TypeRef)
@@ -516,7 +533,7 @@ class RustFormatter(VTable):
         sources.append(
             f"{node.access.value}{node.name}: {map_type_to_rust(node.value)}"
         )
-        return Code("{{ sources }}", sources=", ".join(sources))
+        return Code("{{ sources }}", sources=JoinCode(sources, sep=''))
 
 
     def transform_rust_comment_node(self, node: RustCommentNode) -> Code:
@@ -1,5 +1,6 @@
 import traceback
 
+from unidef.emitters import EMISSION_CACHE
 from unidef.emitters.sql_model import emit_schema_from_model
 from unidef.languages.rust.rust_ast import *
 from unidef.models.config_model import ModelDefinition
@@ -8,12 +9,11 @@ from unidef.utils.transformer import *
 
 
 def find_all_structs_impl(reg: StructRegistry, s: DyType):
-    if s.get_field(Traits.Struct):
-        reg.add_struct(s)
-        for field in s.get_field(Traits.StructFields):
-            find_all_structs_impl(reg, field)
-    for vt in s.get_field(Traits.ValueTypes):
-        find_all_structs_impl(reg, vt)
+    def pre(depth: int, ty: MixedModel):
+        if ty.has(Traits.Struct):
+            reg.add_struct(ty)
+
+    traverse_type(s, pre=pre)
 
 
 def find_all_structs(s: DyType) -> List[DyType]:
@@ -246,7 +246,15 @@ def emit_rust_model_definition(root: ModelDefinition) -> str:
         for struct in find_all_structs(parsed):
             if struct.get_field(Traits.TypeRef):
                 continue
-            formatter.append_format_node(TextNode(str(emit_rust_type_inner(struct, root))))
+            # rendered differently from emit_rust_type, and the root struct also embeds the raw model
+            if struct.get_field(Traits.TypeName) == root.name:
+                extra = ("struct", "root", root.raw)
+            else:
+                extra = ("struct",)
+            text = EMISSION_CACHE.emit(
+                "rust", struct, lambda: str(emit_rust_type_inner(struct, root)), *extra
+            )
+            formatter.append_format_node(TextNode(text))
 
     elif parsed.get_field(Traits.Enum):
         rust_enum = RustEnumNode(parsed)
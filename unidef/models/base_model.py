@@ -1,9 +1,28 @@
 import copy
+import hashlib
+import weakref
 
 from unidef.utils.typing_ext import *
 from typedmodel import *
 from typedmodel.compat import *
-from .typed_field import FieldValue, TypedField
+from .typed_field import BOOLEAN_FIELD_BITS, FieldValue, TypedField
+
+
+class FieldTable:
+    """
+    The declared fields of a model class
+    """
+
+    __slots__ = ("keys", "attributes")
+
+    def __init__(self, cls):
+        keys = cls._keys() - {"extended", "frozen"}
+        self.keys = tuple(sorted(keys))
+        # key -> attribute, an attribute `key_field` also provides `key`
+        self.attributes = {key: key for key in self.keys}
+        for key in self.keys:
+            if key.endswith("_field"):
+                self.attributes.setdefault(key[: -len("_field")], key)
 
 
 class MixedModel(BaseModel):
@@ -16,12 +35,13 @@ class MixedModel(BaseModel):
     @beartype
     def append_field(self, field: FieldValue) -> __qualname__:
         assert not self.is_frozen()
-        if hasattr(self, field.key):
+        if field.key in self._field_table().attributes:
             value = getattr(self, field.key)
         else:
             value = self.extended.get(field.key)
         if value is not None:
             value.extend(field.value)
+            self._changed()
         else:
             self.replace_field(field)
 
@@ -30,32 +50,55 @@ class MixedModel(BaseModel):
     @beartype
     def replace_field(self, field: FieldValue) -> __qualname__:
         assert not self.is_frozen()
-        if hasattr(self, field.key):
+        if field.key in self._field_table().attributes:
             setattr(self, field.key, field.value)
         else:
             self.extended[field.key] = field.value
+            self._changed()
         return self
 
     @beartype
     def remove_field(self, field: TypedField) -> __qualname__:
         assert not self.is_frozen()
-        if hasattr(self, field.key):
+        if field.key in self._field_table().attributes:
             raise Exception(
                 "Could not remove required field {} in {}".format(field.key, type(self))
             )
         if field.key in self.extended:
             self.extended.pop(field.key)
+            self._changed()
         return self
 
+    def __setattr__(self, key, value):
+        super().__setattr__(key, value)
+        self.__dict__.pop("_traits_mask", None)
+
+    def _changed(self):
+        self.__dict__.pop("_traits_mask", None)
+        self.__dict__.pop("_keys_cache", None)
+
+    @classmethod
+    def _keys(cls):
+        # typedmodel collects the declared keys from the class hierarchy whenever a model is constructed
+        keys = cls.__dict__.get("_keys_set_cache")
+        if keys is None:
+            keys = frozenset(super()._keys())
+            cls._keys_set_cache = keys
+        return keys
+
+    @classmethod
+    def _field_table(cls) -> FieldTable:
+        table = cls.__dict__.get("_field_table_cache")
+        if table is None:
+            table = FieldTable(cls)
+            cls._field_table_cache = table
+        return table
+
     def _get_field_raw(self, key: str, default):
-        if hasattr(self, key):
-            return getattr(self, key)
-        if hasattr(self, key + "_field"):
-            return getattr(self, key + "_field")
-        if key in self.extended:
-            return self.extended.get(key)
-        else:
-            return default
+        attribute = self._field_table().attributes.get(key)
+        if attribute is not None:
+            return getattr(self, attribute)
+        return self.extended.get(key, default)
 
     def get_field(self, field: TypedField) -> Any:
         return self._get_field_raw(field.key, field.default)
@@ -66,12 +109,36 @@ class MixedModel(BaseModel):
     def exist_field(self, field: TypedField) -> bool:
         return field.key in self.keys()
 
-    def keys(self) -> List[str]:
-        keys = set(self._keys())
-        keys.update(self.extended.keys())
-        for x in ["extended", "frozen"]:
-            keys.remove(x)
-        return list(keys)
+    def traits_mask(self) -> int:
+        """
+        Bitmask of the boolean fields that are set
+        """
+        cached = self.__dict__.get("_traits_mask")
+        # fields defined after the mask was computed are not in it
+        if cached is not None and cached[1] == len(BOOLEAN_FIELD_BITS):
+            return cached[0]
+        mask = 0
+        for key in self.keys():
+            bit = BOOLEAN_FIELD_BITS.get(key)
+            if bit and self._get_field_raw(key, None):
+                mask |= bit
+        self.__dict__["_traits_mask"] = (mask, len(BOOLEAN_FIELD_BITS))
+        return mask
+
+    def has(self, field: TypedField) -> bool:
+        if field.bit:
+            return bool(self.traits_mask() & field.bit)
+        return bool(self.get_field(field))
+
+    def keys(self) -> Tuple[str, ...]:
+        keys = self.__dict__.get("_keys_cache")
+        if keys is None:
+            declared = self._field_table().attributes
+            keys = self._field_table().keys + tuple(
+                key for key in self.extended if key not in declared
+            )
+            self.__dict__["_keys_cache"] = keys
+        return keys
 
     def __iter__(self):
         collected = self.keys()
@@ -82,18 +149,62 @@ class MixedModel(BaseModel):
         return self.frozen
 
     def freeze(self) -> __qualname__:
-        self.frozen = True
+        """
+        Freezes this model and its children, so that they can be shared
+        """
+
+        def pre(depth: int, node: MixedModel):
+            if node.frozen:
+                return SKIP_CHILDREN
+            node.frozen = True
+
+        traverse_model(self, pre=pre)
         return self
 
     def unfreeze(self) -> __qualname__:
         self.frozen = False
         return self
 
+    def is_interned(self) -> bool:
+        return "_structural_hash" in self.__dict__
+
     def copy(self, *args, **kwargs) -> __qualname__:
-        this = copy.deepcopy(self)
+        """
+        Copy on write: only the top level is copied, the children are frozen and shared with this model.
+        The children stay frozen in this model as well, so afterwards a child of either model is changed
+        by copying it and replacing it in its parent, e.g. by replace_field.
+        """
+        this = type(self).__new__(type(self))
+        # sharing the children of a cyclic model freezes the model itself
+        for key, value in list(self.__dict__.items()):
+            if key != "_structural_hash":
+                this.__dict__[key] = _share(value)
+        this.extended = {key: _share(value) for key, value in self.extended.items()}
         this.unfreeze()
         return this
 
+    def __deepcopy__(self, memo):
+        if self.is_interned():
+            return self
+        this = type(self).__new__(type(self))
+        memo[id(self)] = this
+        for key, value in self.__dict__.items():
+            this.__dict__[key] = copy.deepcopy(value, memo)
+        return this
+
+    def structural_hash(self) -> str:
+        cached = self.__dict__.get("_structural_hash")
+        if cached is not None:
+            return cached
+        return structural_hash(self)
+
+    def _set_field_raw(self, key: str, value):
+        if key in self.extended:
+            self.extended[key] = value
+            self._changed()
+        else:
+            setattr(self, key, value)
+
     def __str__(self):
         return f"{type(self).__qualname__}{dict(list(self))}"
 
@@ -105,11 +216,289 @@ class MixedModel(BaseModel):
             return True
         if type(self) != type(other):
             return False
-        for key in self.keys():
+        if self.is_interned() and other.is_interned():
+            return self.structural_hash() == other.structural_hash()
+        # fields set only on other make them differ as well
+        for key in set(self.keys()) | set(other.keys()):
             if self._get_field_raw(key, default=None) != other._get_field_raw(key, default=None):
                 return False
         return True
 
+    def __hash__(self):
+        if not self.is_interned():
+            raise TypeError(f"unhashable type: '{type(self).__qualname__}', intern it first")
+        return hash(self.structural_hash())
+
+
+class TraitSwitch:
+    """
+    Dispatches on boolean fields: matches the first of the fields, in the given order, that a model has
+    """
+
+    def __init__(self, *fields: TypedField):
+        assert all(field.bit for field in fields), "only boolean fields can be switched on"
+        self.fields = fields
+        self.mask = 0
+        for field in fields:
+            self.mask |= field.bit
+        self.matched: Dict[int, Optional[TypedField]] = {}
+
+    def match(self, model: MixedModel) -> Optional[TypedField]:
+        mask = model.traits_mask() & self.mask
+        try:
+            return self.matched[mask]
+        except KeyError:
+            pass
+        matched = None
+        for field in self.fields:
+            if mask & field.bit:
+                matched = field
+                break
+        self.matched[mask] = matched
+        return matched
+
+
+def _share(value):
+    """
+    Freezes the models in value, and copies the top level of containers so that they can be extended
+    """
+    if isinstance(value, MixedModel):
+        if not value.frozen:
+            value.freeze()
+        return value
+    if isinstance(value, list):
+        return [_share(v) if isinstance(v, MixedModel) else v for v in value]
+    if isinstance(value, dict):
+        return {k: _share(v) if isinstance(v, MixedModel) else v for k, v in value.items()}
+    return value
+
+
+STOP_WALK = "stop_walk"
+SKIP_CHILDREN = "skip_children"
+
+
+def iter_models(value) -> Iterator["MixedModel"]:
+    """
+    The models in a field value, looking into lists, tuples and dicts, in the order that they are hashed
+    """
+    stack = [value]
+    open_containers = set()
+    while stack:
+        value = stack.pop()
+        if isinstance(value, MixedModel):
+            yield value
+        elif isinstance(value, (list, tuple, dict)):
+            # containers can refer to themselves
+            if id(value) in open_containers:
+                continue
+            open_containers.add(id(value))
+            if isinstance(value, dict):
+                values = [value[key] for key in sorted(value, key=str)]
+            else:
+                values = value
+            stack.extend(reversed(values))
+
+
+def model_children(node: "MixedModel") -> List["MixedModel"]:
+    """
+    The models in the fields of a model, in the order of the sorted keys
+    """
+    children = []
+    for key in sorted(node.keys()):
+        children.extend(iter_models(node._get_field_raw(key, None)))
+    return children
+
+
+def traverse_model(
+        root: "MixedModel",
+        pre: Optional[Callable[[int, "MixedModel"], Any]] = None,
+        post: Optional[Callable[[int, "MixedModel"], Any]] = None,
+        key: Optional[Callable[["MixedModel"], Any]] = id,
+        children: Callable[["MixedModel"], List["MixedModel"]] = model_children,
+        depth: int = 0,
+) -> bool:
+    """
+    Depth first traversal of a model with an explicit stack, so that deep models do not hit the recursion limit.
+    pre(depth, node) is called before the children of node, post(depth, node) after them.
+    pre may return SKIP_CHILDREN, and both may return STOP_WALK to end the traversal.
+    Nodes are visited once per key, e.g. id or structural_hash. With key None shared nodes are visited
+    at every occurrence, and only the nodes on the current path are skipped, which still breaks cycles.
+    Returns whether the traversal was stopped.
+    """
+    visited = set()
+    on_path = set()
+    # (node, depth, whether leaving the node)
+    stack = [(root, depth, False)]
+    while stack:
+        node, node_depth, leaving = stack.pop()
+        if leaving:
+            on_path.discard(id(node))
+            if post is not None and post(node_depth, node) == STOP_WALK:
+                return True
+            continue
+        if key is not None:
+            node_key = key(node)
+            if node_key in visited:
+                continue
+            visited.add(node_key)
+        elif id(node) in on_path:
+            continue
+        result = pre(node_depth, node) if pre is not None else None
+        if result == STOP_WALK:
+            return True
+        if result == SKIP_CHILDREN:
+            continue
+        on_path.add(id(node))
+        stack.append((node, node_depth, True))
+        for child in reversed(children(node)):
+            stack.append((child, node_depth + 1, False))
+    return False
+
+
+def _feed_structure(h, value, model_hash: Callable[["MixedModel"], str]):
+    # (whether value is bytes to feed, value, id of the container that it closes)
+    stack = [(False, value, None)]
+    open_containers = set()
+    while stack:
+        is_bytes, value, closing = stack.pop()
+        if closing is not None:
+            open_containers.discard(closing)
+        if is_bytes:
+            h.update(value)
+        elif isinstance(value, MixedModel):
+            # children contribute their own hash, so that the hash of interned children is reused
+            h.update(b"#")
+            h.update(model_hash(value).encode())
+        elif isinstance(value, (list, tuple, dict)):
+            if id(value) in open_containers:
+                h.update(b"^")
+                continue
+            open_containers.add(id(value))
+            if isinstance(value, dict):
+                h.update(b"{")
+                stack.append((True, b"}", id(value)))
+                for key in sorted(value, key=str, reverse=True):
+                    stack.append((True, b",", None))
+                    stack.append((False, value[key], None))
+                    stack.append((True, repr(key).encode() + b":", None))
+            else:
+                h.update(b"[")
+                stack.append((True, b"]", id(value)))
+                for v in reversed(value):
+                    stack.append((True, b",", None))
+                    stack.append((False, v, None))
+        else:
+            h.update(type(value).__name__.encode())
+            h.update(repr(value).encode())
+
+
+def _hash_fields(model: "MixedModel", model_hash: Callable[["MixedModel"], str]) -> str:
+    h = hashlib.sha1()
+    h.update(type(model).__qualname__.encode())
+    h.update(b"{")
+    for key in sorted(model.keys()):
+        h.update(key.encode())
+        h.update(b"=")
+        _feed_structure(h, model._get_field_raw(key, None), model_hash)
+        h.update(b",")
+    h.update(b"}")
+    return h.hexdigest()
+
+
+def structural_hash(value) -> str:
+    """
+    Hash of the content of a model, equal for structurally equal models.
+    Computed in post-order without recursion. A reference back to a model that is still being hashed,
+    in a cyclic model, is hashed as the index of that model in the depth first order
+    """
+    if not isinstance(value, MixedModel):
+        h = hashlib.sha1()
+        _feed_structure(h, value, lambda model: model.structural_hash())
+        return h.hexdigest()
+
+    hashes = {}
+    indexes = {}
+
+    def pre(depth: int, node: MixedModel):
+        indexes[id(node)] = len(indexes)
+        cached = node.__dict__.get("_structural_hash")
+        if cached is not None:
+            hashes[id(node)] = cached
+            return SKIP_CHILDREN
+
+    def model_hash(child: MixedModel) -> str:
+        digest = hashes.get(id(child))
+        if digest is None:
+            return "^" + str(indexes[id(child)])
+        return digest
+
+    def post(depth: int, node: MixedModel):
+        hashes[id(node)] = _hash_fields(node, model_hash)
+
+    traverse_model(value, pre=pre, post=post)
+    return hashes[id(value)]
+
+
+class Interner:
+    """
+    Hash-consing of frozen models: structurally equal models share one canonical instance.
+    Interned models are frozen together with their children, and remember their structural hash,
+    so that comparing and hashing them takes constant time.
+    """
+
+    def __init__(self):
+        self.models = weakref.WeakValueDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def _intern_one(self, model: MixedModel) -> MixedModel:
+        digest = structural_hash(model)
+        canonical = self.models.get(digest)
+        if canonical is not None and type(canonical) is type(model):
+            self.hits += 1
+            return canonical
+        self.misses += 1
+        model.freeze()
+        model.__dict__["_structural_hash"] = digest
+        self.models[digest] = model
+        return model
+
+    def intern(self, model: MixedModel) -> MixedModel:
+        """
+        Returns the canonical instance of model. model must not be mutated afterwards.
+        The children are interned first, in post-order without recursion
+        """
+        # id of a model -> its canonical instance. Models on the path, referred to by a cycle, are kept as they are
+        canonical = {}
+
+        def replace(value):
+            if isinstance(value, MixedModel):
+                return canonical.get(id(value), value)
+            if isinstance(value, list):
+                interned = [replace(v) if isinstance(v, MixedModel) else v for v in value]
+                if any(x is not y for x, y in zip(interned, value)):
+                    return interned
+            return value
+
+        def pre(depth: int, node: MixedModel):
+            if node.is_interned():
+                canonical[id(node)] = node
+                return SKIP_CHILDREN
+
+        def post(depth: int, node: MixedModel):
+            for key in node.keys():
+                value = node._get_field_raw(key, None)
+                interned = replace(value)
+                if interned is not value:
+                    node._set_field_raw(key, interned)
+            canonical[id(node)] = self._intern_one(node)
+
+        traverse_model(model, pre=pre, post=post)
+        return canonical[id(model)]
+
+    def __len__(self):
+        return len(self.models)
+
 
 def test_mixed_model():
     class Model(MixedModel):
@@ -119,3 +508,82 @@ def test_mixed_model():
     model = Model(key1=1, key2=2)
     assert set(model.keys()) == {"key1", "key2"}
     assert dict(list(model)) == {"key1": 1, "key2": 2}
+
+
+def test_structural_hash():
+    class Model(MixedModel):
+        key1: int
+        key2: list
+
+    assert Model(key1=1, key2=[1]).structural_hash() == Model(key1=1, key2=[1]).structural_hash()
+    assert Model(key1=1, key2=[1]).structural_hash() != Model(key1=1, key2=[2]).structural_hash()
+
+
+def test_interner():
+    class Model(MixedModel):
+        key1: int
+        key2: list
+
+    interner = Interner()
+    a = interner.intern(Model(key1=1, key2=[Model(key1=2, key2=[])]))
+    b = interner.intern(Model(key1=1, key2=[Model(key1=2, key2=[])]))
+    assert a is b and a.key2[0].is_frozen()
+    assert hash(a) == hash(b) and len({a, b}) == 1
+    assert a.structural_hash() == Model(key1=1, key2=[Model(key1=2, key2=[])]).structural_hash()
+    c = a.copy()
+    assert not c.is_frozen() and not c.is_interned() and c == a
+    assert c.key2[0] is a.key2[0]
+    assert copy.deepcopy(a) is a
+
+
+def test_copy_on_write():
+    import pytest
+
+    class Model(MixedModel):
+        key1: int
+        key2: list
+
+    child = Model(key1=2, key2=[])
+    model = Model(key1=1, key2=[child])
+    this = model.copy().replace_field(FieldValue(key="key1", value=3))
+    assert model.key1 == 1 and this.key1 == 3
+    assert this.key2[0] is child and child.is_frozen() and not model.is_frozen()
+    this.append_field(FieldValue(key="key2", value=[child]))
+    assert len(model.key2) == 1 and len(this.key2) == 2
+    # the source shares its children with the copy, and can no longer change them in place
+    with pytest.raises(AssertionError):
+        child.replace_field(FieldValue(key="key1", value=4))
+    changed = child.copy().replace_field(FieldValue(key="key1", value=4))
+    model.replace_field(FieldValue(key="key2", value=[changed]))
+    assert model.key2[0].key1 == 4 and this.key2[0].key1 == 2
+
+
+def test_traits_mask():
+    class Model(MixedModel):
+        key1: int
+
+    flag1 = TypedField(key="flag1", ty=bool)
+    flag2 = TypedField(key="flag2", ty=bool)
+    model = Model(key1=1)
+    assert not model.has(flag1)
+    model.replace_field(flag1(True))
+    assert model.has(flag1) and not model.has(flag2)
+    switch = TraitSwitch(flag2, flag1)
+    assert switch.match(model) is flag1
+    model.replace_field(flag2(True))
+    assert switch.match(model) is flag2
+    model.remove_field(flag2)
+    assert switch.match(model) is flag1
+
+
+def test_keys_cache():
+    class Model(MixedModel):
+        key1: int
+
+    flag = TypedField(key="flag", ty=bool)
+    model = Model(key1=1)
+    assert model.keys() == ("key1",)
+    model.append_field(flag(True))
+    assert model.keys() == ("key1", "flag") and model.get_field(flag)
+    model.remove_field(flag)
+    assert model.keys() == ("key1",) and model.get_field_opt(flag) is None
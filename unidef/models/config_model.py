@@ -1,13 +1,41 @@
+import io
+import os
+from stat import S_ISREG
+
 import yaml
 
 from unidef.languages.common.ir_model import IrNode
-from unidef.languages.common.type_model import (GLOBAL_TYPE_REGISTRY, DyType,
-                                                Trait)
+from unidef.languages.common.type_model import (GLOBAL_TYPE_REGISTRY,
+                                                RAW_VALUE_KEEP,
+                                                RAW_VALUE_POLICIES, DyType,
+                                                Trait, apply_raw_value_policy,
+                                                strongest_raw_value_policy)
 from unidef.models.input_model import *
 from unidef.parsers.registry import PARSER_REGISTRY
+from unidef.utils.cache import DiskCache
 from unidef.utils.typing_ext import *
+from unidef.version import VERSION
+
+from pydantic import BaseModel, PrivateAttr, validator
+
+
+PARSE_CACHE: Optional[DiskCache] = None
+if os.environ.get("UNIDEF_CACHE_DIR"):
+    PARSE_CACHE = DiskCache(os.environ["UNIDEF_CACHE_DIR"])
+
+
+def set_parse_cache(cache: Optional[DiskCache]):
+    global PARSE_CACHE
+    PARSE_CACHE = cache
+
 
-from pydantic import BaseModel, validator
+# worker processes inferring the shards of large examples, None for one per cpu
+INFERENCE_JOBS: Optional[int] = 1
+
+
+def set_inference_jobs(jobs: Optional[int]):
+    global INFERENCE_JOBS
+    INFERENCE_JOBS = jobs
 
 
 class ModelDefinition(BaseModel):
@@ -17,11 +45,16 @@ class ModelDefinition(BaseModel):
     ref: str = ""
     note: str = ""
     raw: str = ""
+    span: Tuple[int, int] = (0, 0)
     traits: List[Dict[str, Any]] = []
     example: Optional[ExampleInput] = None
     fields: Optional[FieldsInput] = None
     variants: Optional[VariantsInput] = None
     source: Optional[SourceInput] = None
+    _parsed: Optional[Union[DyType, IrNode]] = PrivateAttr(None)
+    # the policy of Traits.RawValue required by the emitters, and the one _parsed was parsed with
+    _raw_value: Optional[str] = PrivateAttr(None)
+    _parsed_raw_value: Optional[str] = PrivateAttr(None)
 
     @validator("fields")
     def allow_none_fields(cls, v):
@@ -48,14 +81,52 @@ class ModelDefinition(BaseModel):
             traits.append(trait)
         return traits
 
+    def cache_key(self, parser, raw_value: str = RAW_VALUE_KEEP) -> Optional[str]:
+        """
+        None if the model reads an example file whose content can not be identified, like a pipe
+        """
+        parser_name = type(parser).__module__ + "." + type(parser).__qualname__
+        parts = [VERSION, parser_name, raw_value, self.raw or self.json()]
+        if self.example is not None and self.example.file:
+            for file in self.example.files():
+                stat = os.stat(file)
+                if not S_ISREG(stat.st_mode):
+                    return None
+                parts.append(f"{file}:{stat.st_mtime_ns}:{stat.st_size}")
+        return DiskCache.key(*parts)
+
+    def require_raw_value(self, policy: str):
+        """
+        Declares what an emitter of this model needs of Traits.RawValue, see RAW_VALUE_POLICIES.
+        The model is parsed with the strongest of the declared policies, or keeps the value if none was declared
+        """
+        if self._raw_value is None:
+            self._raw_value = policy
+        else:
+            self._raw_value = strongest_raw_value_policy([self._raw_value, policy])
+
+    def raw_value_policy(self) -> str:
+        return self._raw_value or RAW_VALUE_KEEP
+
     @beartype
     def get_parsed(self) -> Union[DyType, IrNode]:
+        """
+        Parses the model once, every emitter of the model shares the result
+        """
+        policy = self.raw_value_policy()
+        if self._parsed is None or RAW_VALUE_POLICIES.index(
+            self._parsed_raw_value
+        ) < RAW_VALUE_POLICIES.index(policy):
+            self._parsed = self._parse(policy)
+            self._parsed_raw_value = policy
+        return self._parsed
+
+    def _parse(self, raw_value: str = RAW_VALUE_KEEP) -> Union[DyType, IrNode]:
         for to_parse in [self.example, self.fields, self.source, self.variants]:
             if to_parse:
                 parser = PARSER_REGISTRY.find_parser(to_parse)
 
                 if parser is not None:
-                    parsed = parser.parse(self.name, to_parse)
                     break
                 else:
                     raise Exception(f"Could not find parser for {to_parse}")
@@ -63,24 +134,93 @@ class ModelDefinition(BaseModel):
         else:
             raise Exception(f"No invalid input for {self}")
 
+        key = None
+        if PARSE_CACHE is not None:
+            key = self.cache_key(parser, raw_value)
+        if key is not None:
+            parsed = PARSE_CACHE.get(key)
+            if parsed is not None:
+                return parsed
+
+        parsed = parser.parse(self.name, to_parse)
+        if isinstance(parsed, DyType):
+            text = None
+            if isinstance(to_parse, ExampleInput):
+                text = to_parse.text or next(iter(to_parse.samples), None)
+            parsed = apply_raw_value_policy(parsed, raw_value, text)
         for t in self.get_field():
             parsed.append_field(t)
+
+        if key is not None:
+            PARSE_CACHE.put(key, parsed)
         return parsed
 
 
-def read_model_definition(content: str) -> List[ModelDefinition]:
-    defs = []
-    segments = content.split("---")
-    for seg in segments:
-        seg = seg.strip()
-        if not seg:
-            continue
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class RecordingStream:
+    """
+    Keeps the text read by the yaml loader until the documents in it have been yielded
+    """
+
+    def __init__(self, stream: io.TextIOBase):
+        self.stream = stream
+        self.text = ""
+        self.offset = 0
+
+    def read(self, size: int = -1) -> str:
+        data = self.stream.read(size)
+        self.text += data
+        return data
+
+    def slice(self, start: int, end: int) -> str:
+        return self.text[start - self.offset : end - self.offset]
+
+    def discard(self, end: int):
+        self.text = self.text[end - self.offset :]
+        self.offset = end
+
+
+def read_model_definition(
+    content: Union[str, io.TextIOBase]
+) -> Iterator[ModelDefinition]:
+    if isinstance(content, str):
+        content = io.StringIO(content)
+    stream = RecordingStream(content)
+    loader = YamlLoader(stream)
+    try:
+        while loader.check_node():
+            node = loader.get_node()
+            start = node.start_mark.index
+            raw = stream.slice(start, node.end_mark.index).rstrip()
+            stream.discard(node.end_mark.index)
+
+            data = loader.construct_document(node)
+            if data is None:
+                continue
+            loaded_model = ModelDefinition.parse_obj(dict(data.items()))
+            loaded_model.raw = raw
+            loaded_model.span = (start, start + len(raw))
+            yield loaded_model
+    finally:
+        loader.dispose()
 
-        data = yaml.safe_load(seg)
-        if data is None:
-            continue
-        loaded_model = ModelDefinition.parse_obj(dict(data.items()))
-        loaded_model.raw = seg
-        defs.append(loaded_model)
 
-    return defs
+def test_read_model_definition():
+    content = """\
+name: first
+example:
+  format: json
+  text: |
+    {"a": "---"}
+---
+---
+name: second
+fields: []
+"""
+    models = list(read_model_definition(content))
+    assert [m.name for m in models] == ["first", "second"]
+    assert models[0].example.text == '{"a": "---"}\n'
+    for m in models:
+        assert content[m.span[0] : m.span[1]] == m.raw
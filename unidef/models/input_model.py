@@ -1,3 +1,5 @@
+import glob
+
 from unidef.utils.typing_ext import *
 from pydantic import BaseModel
 
@@ -8,9 +10,29 @@ class InputDefinition(BaseModel):
         return s[:100]
 
 
+# formats of one example per line, read record by record from ExampleInput.file
+LINE_FORMATS = ["ndjson", "jsonl", "json_lines", "jsonlines"]
+
+
+def is_line_format(fmt: str) -> bool:
+    return fmt.lower() in LINE_FORMATS
+
+
 class ExampleInput(InputDefinition):
     format: str
-    text: str
+    text: str = ""
+    # many examples of the same data, their types are merged
+    samples: List[str] = []
+    # path or glob pattern of the examples, instead of text
+    file: str = ""
+    # which elements of every array are inferred: all, first, stride or reservoir, at most array_samples of them
+    array_sampling: str = "stride"
+    array_samples: int = 100
+
+    def files(self) -> List[str]:
+        if glob.has_magic(self.file):
+            return sorted(glob.glob(self.file, recursive=True))
+        return [self.file]
 
 
 class SourceInput(InputDefinition):
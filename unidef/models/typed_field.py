@@ -2,7 +2,8 @@ import copy
 
 from unidef.utils.typing_ext import *
 from typedmodel.compat import *
-from beartype import beartype
+from beartype.door import die_if_unbearable
+from unidef.utils.checking import beartype
 
 def check_pep_type(obj, annotation) -> bool:
     try:
@@ -12,14 +13,34 @@ def check_pep_type(obj, annotation) -> bool:
 
 
 def check_raise_exception(obj, annotation):
-    @beartype
-    def check(o) -> annotation:
-        return o
-
-    check(obj)
+    compile_validator(annotation)(obj)
     return True
 
 
+def _accept(obj):
+    pass
+
+
+def compile_validator(annotation) -> Callable[[Any], None]:
+    """
+    Returns a function that raises an exception if its argument violates annotation
+    """
+    if annotation is Any:
+        return _accept
+    if type(annotation) is type:
+        # plain classes like bool, str and int
+        def validate(obj):
+            if not isinstance(obj, annotation):
+                die_if_unbearable(obj, annotation)
+
+        return validate
+
+    def validate(obj):
+        die_if_unbearable(obj, annotation)
+
+    return validate
+
+
 class FieldValue:
     def __init__(
         self,
@@ -39,17 +60,34 @@ class FieldValue:
         return "".join(s)
 
 
+BOOLEAN_FIELD_BITS: Dict[str, int] = {}
+
+
+def boolean_field_bit(key: str) -> int:
+    """
+    Returns the bit of a boolean field in the masks of models. Fields of the same key share the bit
+    """
+    bit = BOOLEAN_FIELD_BITS.get(key)
+    if bit is None:
+        bit = 1 << len(BOOLEAN_FIELD_BITS)
+        BOOLEAN_FIELD_BITS[key] = bit
+    return bit
+
+
 class TypedField:
     @beartype
     def __init__(self, key: str, ty, default=None):
         self.key = key
         self.ty = ty
         self.default = default
+        self.bit = boolean_field_bit(key) if ty is bool else 0
+        self.validator = compile_validator(ty)
 
     def validate(self, value):
         if self.default is not None and value is None:
             return True
-        return check_raise_exception(value, self.ty)
+        self.validator(value)
+        return True
 
     def _get_value(self, value):
         if self.default is not None and value is None:
@@ -78,3 +116,10 @@ def test_check_field_definition():
     assert field.validate(None)
     field = TypedField(key="test", ty=Optional[str], default="def")
     assert field.validate(None)
+
+
+def test_boolean_field_bit():
+    a = TypedField(key="test_bit", ty=bool)
+    b = TypedField(key="test_bit", ty=bool)
+    assert a.bit and a.bit == b.bit
+    assert TypedField(key="test", ty=str).bit == 0
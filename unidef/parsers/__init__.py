@@ -2,8 +2,12 @@ from enum import Enum
 
 from pydantic import BaseModel
 
-from unidef.languages.common.type_model import DyType
-from unidef.models.input_model import InputDefinition
+from unidef.languages.common.type_model import ArraySampling, DyType
+from unidef.models.input_model import ExampleInput, InputDefinition
+
+
+def array_sampling(fmt: ExampleInput) -> ArraySampling:
+    return ArraySampling(fmt.array_sampling, fmt.array_samples)
 
 
 class Parser:
@@ -2,7 +2,7 @@ import json
 import logging
 import traceback
 
-from beartype import beartype
+from unidef.utils.checking import beartype
 
 from unidef.languages.common.ir_model import (Attribute, Attributes, IrNode,
                                               Nodes)
@@ -3,9 +3,10 @@ import unicodedata
 
 import pyhocon
 
+from unidef.languages.common.type_merge import TypeMerger
 from unidef.languages.common.type_model import *
 from unidef.models.input_model import ExampleInput, InputDefinition
-from unidef.parsers import Parser
+from unidef.parsers import Parser, array_sampling
 from unidef.utils.typing_ext import *
 
 
@@ -35,23 +36,101 @@ class JsonParser(Parser):
                 comment.clear()
         return result
 
+    def attach_comments(
+            self, ty: DyType, comments: Dict[Tuple[int, str], str]
+    ) -> DyType:
+        """
+        Attaches the comment of the i-th occurrence of a key to the i-th field of that name, in pre-order.
+        Inferred types share frozen children, so a commented field and its frozen parents are copied on write
+        """
+        counts = {}
+        # the comment and the replaced children of every node on the path
+        frames = [(None, [])]
+        path = set()
+
+        def pre(depth: int, node: MixedModel):
+            comment = None
+            if isinstance(node, FieldType):
+                counts[node.field_name] = counts.get(node.field_name, 0) + 1
+                comment = comments.get((counts[node.field_name], node.field_name))
+            frames.append((comment, []))
+            path.add(id(node))
+
+        def post(depth: int, node: MixedModel):
+            comment, results = frames.pop()
+            results = iter(results)
+            # children on the path close a cycle and were not visited
+            new_children = [
+                child if id(child) in path else next(results)
+                for child in type_children(node)
+            ]
+            path.discard(id(node))
+            frames[-1][1].append(replace_children(node, comment, new_children))
+
+        def replace_children(
+                node: MixedModel, comment: Optional[str], new_children: List[MixedModel]
+        ) -> MixedModel:
+            if isinstance(node, FieldType):
+                if comment is None and new_children[0] is node.field_type:
+                    return node
+                if node.is_frozen():
+                    node = node.copy()
+                node.field_type = new_children[0]
+                if comment is not None:
+                    node.append_field(Traits.BeforeLineComment(comment.splitlines()))
+                return node
+
+            new_children = iter(new_children)
+            replaced = {}
+            for trait in [Traits.StructFields, Traits.Generics, Traits.ValueTypes]:
+                if trait is Traits.StructFields and not node.has(Traits.Struct):
+                    continue
+                children = node.get_field(trait) or []
+                new = [
+                    next(new_children) if isinstance(child, MixedModel) else child
+                    for child in children
+                ]
+                if any(x is not y for x, y in zip(new, children)):
+                    replaced[trait] = new
+            if not replaced:
+                return node
+            if node.is_frozen():
+                node = node.copy()
+            for trait, children in replaced.items():
+                if trait is Traits.ValueTypes:
+                    node.replace_field(trait(children))
+                else:
+                    # fields and generics are attributes, assigned as merge_types does
+                    setattr(node, trait.key, children)
+            return node
+
+        traverse_type(ty, pre=pre, post=post, key=None)
+        return frames[0][1][0]
+
+    def parse_sample(self, content: str) -> dict:
+        return dict(pyhocon.ConfigParser.parse(content))
+
+    def parse_samples(self, name: str, fmt: ExampleInput) -> DyType:
+        merger = TypeMerger(name, RAW_VALUE_KEEP, array_sampling(fmt))
+        for sample in fmt.samples:
+            merger.add_sample(self.parse_sample(unicodedata.normalize("NFKC", sample)))
+        parsed = merger.result()
+        if parsed.get_field(Traits.Struct) and name:
+            parsed.replace_field(Traits.TypeName(name))
+        return parsed
+
     def parse(self, name: str, fmt: ExampleInput) -> DyType:
+        if fmt.samples:
+            return self.parse_samples(name, fmt)
         content = fmt.text
         content = unicodedata.normalize("NFKC", content)
         comments = self.parse_comment(content)
 
         parsed = infer_type_from_example(
-            dict(pyhocon.ConfigParser.parse(content)), name
+            self.parse_sample(content), name, RAW_VALUE_KEEP, array_sampling(fmt)
         )
         if parsed.get_field(Traits.Struct) and name:
             parsed.replace_field(Traits.TypeName(name))
-
-            def process(depth: int, i: int, key: str, ty: DyType):
-                if (i, key) in comments:
-                    ty.append_field(
-                        Traits.BeforeLineComment(comments[(i, key)].splitlines())
-                    )
-
-            walk_type_with_count(parsed, process)
+            parsed = self.attach_comments(parsed, comments)
 
         return parsed
@@ -0,0 +1,202 @@
+import hashlib
+import io
+import json
+import mmap
+import os
+from stat import S_ISREG
+
+import unidef.models.config_model as config_model
+from unidef.languages.common.type_merge import TypeMerger
+from unidef.languages.common.type_model import *
+from unidef.models.input_model import (ExampleInput, InputDefinition,
+                                       is_line_format)
+from unidef.parsers import Parser, array_sampling
+from unidef.utils.cache import DiskCache
+from unidef.utils.typing_ext import *
+from unidef.version import VERSION
+
+# bytes of JSON Lines inferred by one worker
+SHARD_SIZE = 64 * 1024 * 1024
+
+# (path, start, end): the lines of a file between two byte offsets, end is None for the rest of a stream
+Shard = Tuple[str, int, Optional[int]]
+
+
+def iter_json_lines(stream: Iterable[Union[bytes, str]], name: str = "<text>") -> Iterator[Any]:
+    """
+    Yields the JSON value of every line that is not blank
+    """
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise Exception(f"Invalid JSON at {name}:{number}: {e}")
+
+
+def map_file(f) -> Optional[mmap.mmap]:
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        # empty files, pipes and devices can not be mapped
+        return None
+
+
+def mapped_lines(mapped: mmap.mmap, start: int, end: Optional[int]) -> Iterator[bytes]:
+    mapped.seek(start)
+    while end is None or mapped.tell() < end:
+        line = mapped.readline()
+        if not line:
+            break
+        yield line
+
+
+def read_json_lines(path: str, start: int = 0, end: Optional[int] = None) -> Iterator[Any]:
+    """
+    Reads the file record by record, memory mapped if it is a regular file, otherwise buffered.
+    start and end must be at the beginning of lines
+    """
+    name = f"{path}@{start}" if start else path
+    with open(path, "rb") as f:
+        mapped = map_file(f)
+        if mapped is None:
+            # pipes can not seek, and are only read from the beginning
+            if start:
+                f.seek(start)
+            yield from iter_json_lines(f, name)
+            return
+        with mapped:
+            yield from iter_json_lines(mapped_lines(mapped, start, end), name)
+
+
+def split_shards(paths: List[str], size: int = SHARD_SIZE) -> List[Shard]:
+    """
+    Splits regular files into shards of about size bytes that end at line ends
+    """
+    shards = []
+    for path in paths:
+        with open(path, "rb") as f:
+            mapped = map_file(f) if S_ISREG(os.fstat(f.fileno()).st_mode) else None
+            if mapped is None:
+                shards.append((path, 0, None))
+                continue
+            with mapped:
+                start = 0
+                while start < len(mapped):
+                    end = mapped.find(b"\n", min(start + size, len(mapped)) - 1)
+                    end = len(mapped) if end < 0 else end + 1
+                    shards.append((path, start, end))
+                    start = end
+    return shards
+
+
+def shard_cache_key(
+        shard: Shard,
+        prefix: str,
+        raw_value: str,
+        sampling: ArraySampling = DEFAULT_ARRAY_SAMPLING,
+) -> Optional[str]:
+    """
+    Keyed by the content of the shard, so that the shards of a growing log keep their keys
+    """
+    path, start, end = shard
+    if end is None:
+        return None
+    with open(path, "rb") as f:
+        mapped = map_file(f)
+        if mapped is None:
+            return None
+        with mapped:
+            digest = hashlib.sha1(mapped[start:end]).hexdigest()
+    return DiskCache.key(
+        VERSION, "json_lines_shard", prefix, raw_value, repr(sampling), digest
+    )
+
+
+def infer_shard(
+        shard: Shard,
+        prefix: str,
+        raw_value: str,
+        cache: Optional[DiskCache] = None,
+        sampling: ArraySampling = DEFAULT_ARRAY_SAMPLING,
+) -> TypeMerger:
+    """
+    The partial type of the samples in shard
+    """
+    key = None
+    if cache is not None:
+        key = shard_cache_key(shard, prefix, raw_value, sampling)
+    if key is not None:
+        merger = cache.get(key)
+        if merger is not None:
+            return merger
+
+    merger = TypeMerger(prefix, raw_value, sampling)
+    for sample in read_json_lines(*shard):
+        merger.add_sample(sample)
+
+    if key is not None:
+        cache.put(key, merger)
+    return merger
+
+
+def _infer_shard_task(
+        task: Tuple[Shard, str, str, Optional[DiskCache], ArraySampling]
+) -> TypeMerger:
+    return infer_shard(*task)
+
+
+def infer_shards(
+        shards: List[Shard],
+        prefix: str = "",
+        jobs: Optional[int] = 1,
+        cache: Optional[DiskCache] = None,
+        sampling: ArraySampling = DEFAULT_ARRAY_SAMPLING,
+) -> TypeMerger:
+    """
+    Infers the shards in a process pool, and merges the partial types in the order of shards.
+    Only the first sample of the first shard keeps its value
+    """
+    tasks = [
+        (shard, prefix, RAW_VALUE_KEEP if i == 0 else RAW_VALUE_DROP, cache, sampling)
+        for i, shard in enumerate(shards)
+    ]
+    merger = TypeMerger(prefix, RAW_VALUE_DROP, sampling)
+    if jobs == 1 or len(tasks) <= 1:
+        for partial in map(_infer_shard_task, tasks):
+            merger.merge(partial)
+        return merger
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for partial in executor.map(_infer_shard_task, tasks):
+            merger.merge(partial)
+    return merger
+
+
+class NdjsonParser(Parser):
+    def accept(self, fmt: InputDefinition) -> bool:
+        return isinstance(fmt, ExampleInput) and is_line_format(fmt.format)
+
+    def infer(self, name: str, fmt: ExampleInput) -> TypeMerger:
+        if fmt.file:
+            return infer_shards(
+                split_shards(fmt.files()),
+                name,
+                config_model.INFERENCE_JOBS,
+                config_model.PARSE_CACHE,
+                array_sampling(fmt),
+            )
+        merger = TypeMerger(name, RAW_VALUE_KEEP, array_sampling(fmt))
+        for sample in iter_json_lines(io.StringIO(fmt.text)):
+            merger.add_sample(sample)
+        return merger
+
+    def parse(self, name: str, fmt: ExampleInput) -> DyType:
+        parsed = self.infer(name, fmt).result()
+        if parsed.get_field(Traits.Struct) and name:
+            parsed.replace_field(Traits.TypeName(name))
+        return parsed
@@ -1,37 +1,72 @@
-import os
-
 from unidef.parsers import Parser
 
-from unidef.models.input_model import InputDefinition
-from unidef.utils.loader import load_module
+from unidef.models.input_model import *
+from unidef.utils.loader import LazyPlugin, load_entry_points
 from unidef.utils.typing_ext import *
 
 
 class ParserRegistry:
-    def __init__(self):
-        self.parsers: List[Parser] = []
+    def __init__(self, entry_point_group: Optional[str] = None):
+        self.parsers: List[Union[Parser, LazyPlugin]] = []
+        self.entry_point_group = entry_point_group
+        self.entry_points_loaded = False
 
     def add_parser(self, parser: Parser):
         self.parsers.append(parser)
 
-    def find_parser(self, fmt: InputDefinition) -> Optional[Parser]:
+    def add_lazy_parser(
+        self, name: str, module: str, accept: Callable[[InputDefinition], bool]
+    ):
+        self.parsers.append(LazyPlugin(name, module, accept))
+
+    def _find_parser(self, fmt: InputDefinition) -> Optional[Parser]:
         for p in self.parsers:
             if p.accept(fmt):
+                if isinstance(p, LazyPlugin):
+                    p = p.load()
+                    if p is None or not p.accept(fmt):
+                        continue
                 return p
 
+    def find_parser(self, fmt: InputDefinition) -> Optional[Parser]:
+        parser = self._find_parser(fmt)
+        if parser is None and self.entry_point_group and not self.entry_points_loaded:
+            self.entry_points_loaded = True
+            for p in load_entry_points(self.entry_point_group):
+                self.add_parser(p)
+            parser = self._find_parser(fmt)
+        return parser
+
 
-PARSER_REGISTRY = ParserRegistry()
+PARSER_REGISTRY = ParserRegistry(entry_point_group="unidef.parsers")
 
 
-def add_parser(name: str, emitter: str):
-    module = load_module(name)
-    if module:
-        PARSER_REGISTRY.add_parser(module.__dict__[emitter]())
+def add_parser(name: str, module: str, accept: Callable[[InputDefinition], bool]):
+    PARSER_REGISTRY.add_lazy_parser(name, "unidef.parsers." + module, accept)
 
 
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-add_parser("json_parser", "JsonParser")
-add_parser("fields_parser", "FieldsParser")
-add_parser("variants_parser", "VariantsParser")
-add_parser("javascript_parser", "JavascriptParser")
-add_parser("fix_parser", "FixParser")
+add_parser(
+    "JsonParser",
+    "json_parser",
+    lambda fmt: isinstance(fmt, ExampleInput) and fmt.format.lower() == "json",
+)
+add_parser(
+    "NdjsonParser",
+    "ndjson_parser",
+    lambda fmt: isinstance(fmt, ExampleInput) and is_line_format(fmt.format),
+)
+add_parser("FieldsParser", "fields_parser", lambda fmt: isinstance(fmt, FieldsInput))
+add_parser(
+    "VariantsParser", "variants_parser", lambda fmt: isinstance(fmt, VariantsInput)
+)
+add_parser(
+    "JavascriptParser",
+    "javascript_parser",
+    lambda fmt: isinstance(fmt, SourceInput) and fmt.lang == "javascript",
+)
+add_parser(
+    "FixParser",
+    "fix_parser",
+    lambda fmt: isinstance(fmt, ExampleInput)
+    and fmt.format.lower().startswith("fix"),
+)
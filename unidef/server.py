@@ -0,0 +1,65 @@
+import logging
+import os
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class EmitRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /emit?target=rust[&format=json|&lang=javascript] with the model text as body,
+    responds with the emitted code, one document per line as in the command line
+    """
+
+    service = None
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/emit":
+            self._respond(404, f"Unknown path {url.path}")
+            return
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        content = self.rfile.read(length).decode()
+        try:
+            outputs = self.service.emit_request(query, content)
+        except Exception as e:
+            logging.exception("Could not emit request")
+            self._respond(400, f"{type(e).__name__}: {e}")
+            return
+        self._respond(200, "".join(output + "\n" for output in outputs))
+
+    def _respond(self, status: int, text: str):
+        body = text.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(format, *args)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+def create_server(address: str, service) -> socketserver.BaseServer:
+    """
+    Serves on host:port, or on a unix socket for any other address.
+    The service must provide emit_request(query, content) -> List[str]
+    """
+    handler = type(
+        "BoundEmitRequestHandler", (EmitRequestHandler,), {"service": service}
+    )
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit() and "/" not in address:
+        return ThreadingHTTPServer((host, int(port)), handler)
+    if os.path.exists(address):
+        os.unlink(address)
+    return UnixHTTPServer(address, handler)
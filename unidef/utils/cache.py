@@ -0,0 +1,141 @@
+import hashlib
+import logging
+import os
+import pickle
+import stat
+import tempfile
+import threading
+from collections import OrderedDict
+
+from unidef.utils.typing_ext import *
+from unidef.version import VERSION
+
+
+def file_mode(path: str) -> int:
+    """
+    The mode of the existing file, or of a new file created with the current umask
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def atomic_write(path: str, data: bytes):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp creates the file readable by the owner only
+        os.chmod(tmp, file_mode(path))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class DiskCache:
+    """
+    Content addressed cache of pickled objects, one file per key
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(part.encode())
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning("Could not load cache entry %s %s %s, skipping", key, type(e), e)
+            return None
+
+    def put(self, key: str, value: Any):
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logging.warning("Could not pickle %s %s %s, not caching", type(value).__name__, type(e), e)
+            return
+        atomic_write(self._path(key), data)
+
+
+class EmissionCache:
+    """
+    Emitted code keyed by target and the structural hash of the emitted type,
+    kept in a bounded in-process LRU and optionally on disk
+    """
+
+    def __init__(self, disk: Optional[DiskCache] = None, capacity: int = 65536):
+        self.disk = disk
+        self.capacity = capacity
+        self.memory: OrderedDict = OrderedDict()
+        # guards memory only, emitting runs unlocked in the threads of the server
+        self.lock = threading.Lock()
+
+    def emit(self, target: str, ty, emit: Callable[[], str], *extra: str) -> str:
+        try:
+            digest = ty.structural_hash()
+        except Exception as e:
+            logging.warning("Could not hash %s %s %s, not caching", type(ty).__name__, type(e), e)
+            return emit()
+        key = DiskCache.key(VERSION, target, digest, *extra)
+        with self.lock:
+            result = self.memory.get(key)
+            if result is not None:
+                self.memory.move_to_end(key)
+                return result
+        if self.disk is not None:
+            result = self.disk.get(key)
+        if result is None:
+            result = emit()
+            if self.disk is not None:
+                self.disk.put(key, result)
+        with self.lock:
+            self.memory[key] = result
+            if len(self.memory) > self.capacity:
+                self.memory.popitem(last=False)
+        return result
+
+
+def test_disk_cache(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    key = DiskCache.key("a", "b")
+    assert key != DiskCache.key("ab")
+    assert cache.get(key) is None
+    cache.put(key, {"value": [1, 2]})
+    assert cache.get(key) == {"value": [1, 2]}
+
+
+def test_emission_cache(tmp_path):
+    from unidef.languages.common.type_model import Types
+
+    emitted = []
+
+    def emit():
+        emitted.append(1)
+        return "i64"
+
+    cache = EmissionCache(disk=DiskCache(str(tmp_path)))
+    assert cache.emit("rust", Types.I64, emit) == "i64"
+    assert cache.emit("rust", Types.I64.copy(), emit) == "i64"
+    assert EmissionCache(disk=DiskCache(str(tmp_path))).emit("rust", Types.I64, emit) == "i64"
+    assert len(emitted) == 1
+    cache.emit("sql", Types.I64, emit)
+    assert len(emitted) == 2
@@ -0,0 +1,86 @@
+"""
+Runtime type checking of internal functions.
+
+By default every internal function and model method is checked with beartype.
+In production mode they are defined without the checker, and only the entry points in `unidef.__main__`
+keep checking their arguments. Enable it with the environment variable UNIDEF_PRODUCTION=1, or call
+`set_production_mode()` before the other modules of unidef are imported: the checker is applied when
+a function or class is defined.
+"""
+import os
+
+import beartype as _beartype_module
+import typedmodel.models
+import typedmodel.utils
+from beartype.door import die_if_unbearable
+from beartype.roar import BeartypeDoorHintViolation
+from typedmodel.compat import *
+from typedmodel.exceptions import TypeException
+
+
+def check_field_value(obj, annotation) -> bool:
+    """
+    Checks the values assigned to the fields of typedmodel models.
+    beartype caches the checker of every annotation, unlike typedmodel, which decorates a new function per value
+    """
+    try:
+        die_if_unbearable(obj, annotation)
+    except BeartypeDoorHintViolation as e:
+        raise TypeException(e.args[0])
+    return True
+
+# (module, name, checked, unchecked)
+_PATCHES = [
+    # typedmodel checks the methods of every model when the class is created
+    (typedmodel.models, "my_beartype", typedmodel.utils.my_beartype, lambda func: func),
+    (typedmodel.utils, "my_beartype", typedmodel.utils.my_beartype, lambda func: func),
+    # and the values assigned to the fields of models
+    (
+        typedmodel.models,
+        "check_pep_type_raise_exception",
+        check_field_value,
+        lambda obj, annotation: True,
+    ),
+]
+_my_beartype = typedmodel.utils.my_beartype
+
+PRODUCTION_MODE = False
+
+
+def is_production_mode() -> bool:
+    return PRODUCTION_MODE
+
+
+def set_production_mode(enabled: bool = True):
+    """
+    Affects only the functions and classes defined afterwards
+    """
+    global PRODUCTION_MODE
+    PRODUCTION_MODE = enabled
+    for module, name, checked, unchecked in _PATCHES:
+        setattr(module, name, unchecked if enabled else checked)
+
+
+def beartype(func):
+    if PRODUCTION_MODE:
+        return func
+    return _beartype_module.beartype(func)
+
+
+def api_beartype(func):
+    """
+    Checks the entry points, also in production mode
+    """
+    return _beartype_module.beartype(func)
+
+
+def my_beartype(func):
+    """
+    beartype raising the exceptions of typedmodel
+    """
+    if PRODUCTION_MODE:
+        return func
+    return _my_beartype(func)
+
+
+set_production_mode(os.environ.get("UNIDEF_PRODUCTION", "").lower() in ("1", "true", "yes"))
@@ -2,6 +2,8 @@ import importlib
 import logging
 import traceback
 
+from unidef.utils.typing_ext import *
+
 
 def load_module(name: str):
     try:
@@ -10,3 +12,50 @@ def load_module(name: str):
         logging.warning("Could not load module %s %s %s, skipping", name, type(e), e)
         if not isinstance(e, ModuleNotFoundError):
             traceback.print_exc()
+
+
+class LazyPlugin:
+    """
+    A plugin class that is imported and instantiated only when its cheap predicate accepts the input
+    """
+
+    def __init__(self, name: str, module: str, accept: Callable[[Any], bool]):
+        self.name = name
+        self.module = module
+        self.predicate = accept
+        self.instance = None
+        self.loaded = False
+
+    def accept(self, fmt) -> bool:
+        return self.predicate(fmt)
+
+    def load(self) -> Optional[Any]:
+        if not self.loaded:
+            self.loaded = True
+            module = load_module(self.module)
+            if module:
+                self.instance = module.__dict__[self.name]()
+        return self.instance
+
+    def __repr__(self):
+        return f"LazyPlugin({self.module}.{self.name})"
+
+
+def load_entry_points(group: str) -> List[Any]:
+    """
+    Instantiates the plugins that third-party packages register under the entry point group
+    """
+    from importlib.metadata import entry_points
+
+    eps = entry_points()
+    if hasattr(eps, "select"):
+        eps = eps.select(group=group)
+    else:
+        eps = eps.get(group, [])
+    plugins = []
+    for ep in eps:
+        try:
+            plugins.append(ep.load()())
+        except Exception as e:
+            logging.warning("Could not load plugin %s %s %s, skipping", ep.name, type(e), e)
+    return plugins
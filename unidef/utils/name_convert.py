@@ -1,5 +1,7 @@
+import functools
+
 import case_conversion
-from beartype import beartype
+from unidef.utils.checking import beartype
 
 
 @beartype
@@ -7,11 +9,15 @@ def to_lower(s: str) -> str:
     return s.lower()
 
 
+# called for the name of every field of every inferred example
+_snakecase = functools.lru_cache(maxsize=4096)(case_conversion.snakecase)
+
+
 @beartype
 def to_snake_case(s: str) -> str:
     if "_" in s:
         s = s.lower()
-    converted = case_conversion.snakecase(s)
+    converted = _snakecase(s)
     return converted
 
 
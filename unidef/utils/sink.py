@@ -0,0 +1,108 @@
+import logging
+import os
+
+from unidef.utils.cache import atomic_write
+from unidef.utils.name_convert import to_snake_case
+from unidef.utils.typing_ext import *
+
+
+def write_if_changed(path: str, text: str) -> bool:
+    """
+    Atomically replaces the file, unless it already has the same content, so that its mtime stays untouched
+    """
+    data = text.encode()
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, "rb") as f:
+                if f.read() == data:
+                    return False
+    except FileNotFoundError:
+        pass
+    atomic_write(path, data)
+    return True
+
+
+def target_suffix(target: str) -> str:
+    if target.startswith("rust"):
+        return ".rs"
+    if target.startswith("python"):
+        return ".py"
+    if target == "sql":
+        return ".sql"
+    return ".txt"
+
+
+class OutputSink:
+    def write(self, name: str, target: str, text: str):
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+
+
+class CallbackSink(OutputSink):
+    def __init__(self, output: Callable[[str], None]):
+        self.output = output
+
+    def write(self, name: str, target: str, text: str):
+        self.output(text)
+
+
+class FileSink(OutputSink):
+    """
+    Bundles every model into one file, written once on close
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.buffer: List[str] = []
+
+    def write(self, name: str, target: str, text: str):
+        self.buffer.append(text)
+        self.buffer.append("\n")
+
+    def close(self):
+        if write_if_changed(self.path, "".join(self.buffer)):
+            logging.info("Wrote %s", self.path)
+        self.buffer = []
+
+
+class DirectorySink(OutputSink):
+    """
+    Writes every model into its own file named after the model,
+    in a sub directory per target if there are many targets
+    """
+
+    def __init__(self, directory: str, per_target: bool = False):
+        self.directory = directory
+        self.per_target = per_target
+        self.written: Set[str] = set()
+
+    def write(self, name: str, target: str, text: str):
+        directory = self.directory
+        if self.per_target:
+            directory = os.path.join(directory, target)
+        path = os.path.join(directory, to_snake_case(name) + target_suffix(target))
+        if path in self.written:
+            logging.warning("%s is written by more than one model named %s", path, name)
+        self.written.add(path)
+        if write_if_changed(path, text + "\n"):
+            logging.info("Wrote %s", path)
+
+
+def test_write_if_changed(tmp_path):
+    path = str(tmp_path / "out.rs")
+    assert write_if_changed(path, "struct A;")
+    mtime = os.stat(path).st_mtime_ns
+    assert not write_if_changed(path, "struct A;")
+    assert os.stat(path).st_mtime_ns == mtime
+    assert write_if_changed(path, "struct B;")
+    with open(path) as f:
+        assert f.read() == "struct B;"
@@ -1,4 +1,4 @@
 # re-export
 from typedmodel.compat import *
 from typedmodel.utils import abstract
-from beartype import beartype
+from unidef.utils.checking import beartype
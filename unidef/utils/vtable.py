@@ -1,5 +1,7 @@
 from typedmodel.compat import *
-from typedmodel.utils import my_beartype, reannotate, abstract, check_pep_type
+from beartype.door import is_bearable
+from typedmodel.utils import abstract, reannotate
+from unidef.utils.checking import my_beartype
 
 
 class TypeAcceptor:
@@ -7,7 +9,10 @@ class TypeAcceptor:
         self.annotation = annotation
 
     def __call__(self, val):
-        return check_pep_type(val, self.annotation)
+        try:
+            return is_bearable(val, self.annotation)
+        except Exception:
+            return False
 
     def __str__(self):
         return 'accept: ' + str(self.annotation)